@@ -2,12 +2,83 @@ from django.contrib import admin
 from .models import Product, Category
 
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import *
 
 from django.contrib import admin
-from .models import MainCategory, Akchii
-admin.site.register(Akchii)
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.urls import reverse
+
+from .crm_search import order_search_filter
+from .images import admin_thumbnail_url, admin_thumbnail_urls
+from .models import MainCategory, Akchii, name_prefix_filter
+
+
+class PrefixAutocompleteMixin:
+    """
+    Автодополнение в админке ищет по началу названия через индекс search_name
+    (см. name_prefix_filter); обычный поиск в списке остаётся прежним.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if request.path == reverse('admin:autocomplete'):
+            if search_term:
+                queryset = queryset.filter(name_prefix_filter(search_term)).order_by('search_name')
+            return queryset, False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class PrefetchedAutocompleteSelect(AutocompleteSelect):
+    """
+    AutocompleteSelect, который берёт подписи выбранных значений из общего
+    словаря prefetched вместо отдельного запроса на каждую строку инлайна.
+    """
+    prefetched = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = [str(v) for v in value if str(v) not in self.choices.field.empty_values]
+        if self.prefetched is None or not all(pk in self.prefetched for pk in selected):
+            return super().optgroups(name, value, attr)
+
+        default = (None, [], 0)
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        for pk in selected:
+            obj = self.prefetched[pk]
+            default[1].append(self.create_option(
+                name, obj.pk, self.choices.field.label_from_instance(obj), set(selected), len(default[1])
+            ))
+        return [default]
+
+
+class ThumbnailChangeList(ChangeList):
+    """Список товаров: миниатюры всей страницы одним запросом к кэшу, а не по строке"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        urls = admin_thumbnail_urls(obj.image.name for obj in self.result_list)
+        for obj in self.result_list:
+            obj.admin_thumbnail = urls.get(obj.image.name)
+
+
+class CategoryListFilter(admin.RelatedFieldListFilter):
+    """Фильтр по категории без запроса основной категории на каждый пункт"""
+
+    def field_choices(self, field, request, model_admin):
+        return [
+            (category.pk, str(category))
+            for category in Category.objects.select_related('main_category')
+        ]
+
+
+@admin.register(Akchii)
+class AkchiiAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
+    list_display = ('name', 'price', 'skidka', 'available', 'created')
+    list_filter = ('available',)
+    search_fields = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
 
 
 @admin.register(MainCategory)
@@ -35,13 +106,16 @@ class ShopAdmin(admin.ModelAdmin):
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug')
+    list_display = ('name', 'main_category', 'slug')
+    list_filter = ('main_category',)
+    # __str__ категории читает main_category.name (в т.ч. для чекбоксов действий)
+    list_select_related = ('main_category',)
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ('name',)
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(PrefixAutocompleteMixin, admin.ModelAdmin):
     list_display = (
         'name', 
         'category', 
@@ -53,10 +127,11 @@ class ProductAdmin(admin.ModelAdmin):
     )
     list_filter = (
         'product_type',
-        'category',
+        ('category', CategoryListFilter),
         'available',
         'created'
     )
+    list_select_related = ('category__main_category',)
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
     fieldsets = (
@@ -97,9 +172,22 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'category':
+            kwargs['queryset'] = Category.objects.select_related('main_category')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist(self, request, **kwargs):
+        return ThumbnailChangeList
+
     def display_image(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" />', obj.image.url)
+            # Миниатюра 100px вместо оригинала: страница списка не тянет полноразмерные фото
+            if hasattr(obj, 'admin_thumbnail'):
+                url = obj.admin_thumbnail or obj.image.url
+            else:
+                url = admin_thumbnail_url(obj.image.name) or obj.image.url
+            return format_html('<img src="{}" width="50" loading="lazy" />', url)
         return "Нет изображения"
     display_image.short_description = "Изображение"
 
@@ -112,29 +200,82 @@ class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ('get_cost',)
-    
+    # Вместо <select> со всем каталогом в каждой строке — поиск по началу названия
+    autocomplete_fields = ('product', 'akchii')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'akchii')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.autocomplete_fields:
+            kwargs['widget'] = PrefetchedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        if obj is not None:
+            # Выбранные товары всех строк заказа — двумя запросами на страницу
+            items = list(self.get_queryset(request).filter(order=obj))
+            for field_name in self.autocomplete_fields:
+                widget = formset.form.base_fields[field_name].widget
+                widget = getattr(widget, 'widget', widget)
+                widget.prefetched = {
+                    str(getattr(item, f'{field_name}_id')): getattr(item, field_name)
+                    for item in items if getattr(item, f'{field_name}_id')
+                }
+        return formset
+
     def get_cost(self, obj):
         return obj.get_cost()
     get_cost.short_description = "Стоимость"
 
 
+class TotalPriceFilter(admin.SimpleListFilter):
+    title = "Сумма заказа"
+    parameter_name = 'total'
+
+    RANGES = {
+        'lt1000': ("до 1 000 сом", {'total_price__lt': 1000}),
+        '1000-3000': ("1 000 – 3 000 сом", {'total_price__gte': 1000, 'total_price__lt': 3000}),
+        '3000-10000': ("3 000 – 10 000 сом", {'total_price__gte': 3000, 'total_price__lt': 10000}),
+        'gte10000': ("от 10 000 сом", {'total_price__gte': 10000}),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _) in self.RANGES.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() in self.RANGES:
+            return queryset.filter(**self.RANGES[self.value()][1])
+        return queryset
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'full_name', 'phone', 
-        'status', 'payment_method', 'total_price', 'created_date'
+        'status', 'payment_method', 'total_price', 'items_count', 'created_date'
     )
     list_display_links = ('id', 'full_name')
-    list_filter = ('status', 'payment_method', 'created_date', 'shop')
+    list_filter = ('status', 'payment_method', TotalPriceFilter, 'created_date', 'shop')
     search_fields = (
-        'full_name', 'email', 'phone', 
-        'address', 'card_message', 'comments'
+        'full_name', 'phone',
+        'address', 'card_message', 'comment'
     )
+    search_help_text = 'Номер заказа, телефон (целиком, в любом виде) или начало слов из ФИО, адреса, открытки, комментария'
     inlines = [OrderItemInline]
-    readonly_fields = ('created_date', 'updated_date', 'total_price')
+    readonly_fields = ('created_date', 'updated_date', 'total_price', 'items_count')
     list_editable = ('status',)
     date_hierarchy = 'created_date'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо icontains по пяти столбцам — индексы (см. order_search_filter)
+        if search_term.strip():
+            queryset = queryset.filter(order_search_filter(search_term))
+        return queryset, False
+
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -152,6 +293,38 @@ class CustomerAdmin(admin.ModelAdmin):
 @admin.register(TelegramManager)
 class TelegramManagerAdmin(admin.ModelAdmin):
     list_display = ('user', 'chat_id', 'is_active', 'notify_orders')
+    list_select_related = ('user',)
     list_filter = ('is_active', 'notify_orders')
     search_fields = ('user__username', 'user__first_name', 'user__last_name', 'chat_id')
-    list_editable = ('is_active', 'notify_orders')
\ No newline at end of file
+    list_editable = ('is_active', 'notify_orders')
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'status', 'attempts', 'next_attempt_at', 'created')
+    list_select_related = ('order',)
+    list_filter = ('status',)
+    readonly_fields = ('recipients', 'delivered', 'documents_delivered', 'attempts', 'last_error', 'created', 'updated')
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=NotificationOutbox.STATUS_SENT).update(
+            status=NotificationOutbox.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"Поставлено в очередь повторно: {updated}")
+    retry_now.short_description = "Отправить повторно"
+
+
+@admin.register(TelegramUploadStats)
+class TelegramUploadStatsAdmin(admin.ModelAdmin):
+    """Только просмотр: счётчики пишет core.telegram_bot.record_upload_metrics"""
+    list_display = ('day', 'uploads', 'uploaded_bytes', 'reuses', 'saved_bytes')
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
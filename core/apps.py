@@ -8,6 +8,8 @@ class CoreConfig(AppConfig):
     scheduler_started = False  # Флаг, чтобы не запускать дважды
 
     def ready(self):
+        from . import signals  # noqa: F401 — регистрация обработчиков сигналов
+
         if CoreConfig.scheduler_started:
             return  # чтобы не было двойного запуска при автоперезапуске runserver
 
@@ -15,9 +17,11 @@ class CoreConfig(AppConfig):
             return
 
         from core.utils import send_daily_report
+        from core.outbox import drain_outbox
 
         scheduler = BackgroundScheduler()
         scheduler.add_job(send_daily_report, 'cron', hour=11, minute=27)
+        scheduler.add_job(drain_outbox, 'interval', seconds=30)
         scheduler.start()
 
         CoreConfig.scheduler_started = True
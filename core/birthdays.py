@@ -0,0 +1,42 @@
+import calendar
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Customer, month_day
+
+BIRTHDAY_FIELDS = ('birthday_mmdd', 'spouse_birthday_mmdd')
+DAYS_IN_YEAR = 366
+
+
+def window_month_days(start, days=1):
+    """
+    Значения MMDD для дней рождения с start по start + days - 1, в том
+    числе через Новый год. Родившиеся 29 февраля в невисокосный год
+    поздравляются 28-го.
+    """
+    month_days = []
+    for offset in range(min(days, DAYS_IN_YEAR)):
+        current = start + timedelta(days=offset)
+        month_days.append(month_day(current))
+        if current.month == 2 and current.day == 28 and not calendar.isleap(current.year):
+            month_days.append(229)
+    return sorted(set(month_days))
+
+
+def birthday_filter(start, days=1, fields=BIRTHDAY_FIELDS):
+    """
+    Клиенты, у которых сам клиент или супруг(а) празднует в окне.
+
+    Именно IN, а не диапазоны MMDD: с диапазонами через Новый год и
+    сортировкой по -id SQLite выбирает полный проход по таблице.
+    """
+    month_days = window_month_days(start, days)
+    return Q(*[Q(**{f'{field}__in': month_days}) for field in fields], _connector=Q.OR)
+
+
+def upcoming_birthdays(days=1, today=None):
+    """Клиенты с днями рождения в ближайшие days дней, начиная с сегодняшнего"""
+    today = today or timezone.localdate()
+    return Customer.objects.filter(birthday_filter(today, days))
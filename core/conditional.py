@@ -0,0 +1,125 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Akchii, ContentVersion, Product
+from .shuffle import SHUFFLE_PERIOD_SECONDS, current_shuffle_seed
+
+CONTENT_VERSION_PK = 1
+
+
+def content_changed_at():
+    """
+    Время последнего изменения данных без поля updated: категории, магазины,
+    отзывы, а также удаления товаров (удаление не двигает Max(updated)).
+    Читается из строки ContentVersion одним запросом по первичному ключу.
+    """
+    changed = ContentVersion.objects.filter(pk=CONTENT_VERSION_PK).values_list('changed', flat=True).first()
+    if changed is None:
+        # Строку создаёт миграция; без неё (пустая БД) отметкой станет первое изменение
+        return datetime.fromtimestamp(0, timezone.utc)
+    return changed
+
+
+def touch_content():
+    """
+    Отмечает изменение данных, у которых нет своего updated (см. core.signals).
+    Вызывается внутри транзакции изменения: отметка и данные коммитятся вместе.
+    """
+    now = timezone.now()
+    if not ContentVersion.objects.filter(pk=CONTENT_VERSION_PK).update(changed=now):
+        ContentVersion.objects.get_or_create(pk=CONTENT_VERSION_PK, defaults={'changed': now})
+
+
+def watermark(queryset):
+    """
+    Max(updated) — меняется при любом сохранении. Удаления его не двигают,
+    их отмечает content_changed_at, которая входит в валидаторы.
+    Считается по индексу на updated, без чтения строк таблицы.
+    """
+    return queryset.order_by().aggregate(last=Max('updated'))['last']
+
+
+def build_validators(*parts, last_modified=()):
+    """
+    ETag из частей-версий и Last-Modified как максимум из отметок времени.
+
+    В ETag входит и хэш манифеста статики: после деплоя с новыми шаблонами
+    и бандлами у клиентов не останется старого HTML.
+    """
+    changed = content_changed_at()
+    parts += (changed, getattr(staticfiles_storage, 'manifest_hash', ''))
+    etag = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    stamps = [stamp.timestamp() if isinstance(stamp, datetime) else stamp
+              for stamp in (*last_modified, changed) if stamp is not None]
+    return quote_etag(etag), int(max(stamps))
+
+
+def conditional_page(validators_func):
+    """
+    Conditional GET для страницы: validators_func(request, *args, **kwargs)
+    возвращает (etag, last_modified) по дешёвым агрегатам, и при совпадении
+    с If-None-Match / If-Modified-Since ответ 304 уходит без рендера шаблона.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = validators_func(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response.headers.setdefault('ETag', etag)
+                    response.headers.setdefault('Last-Modified', http_date(last_modified))
+            return response
+        return wrapper
+    return decorator
+
+
+def catalog_validators(request, main_category_slug=None, category_slug=None):
+    products = Product.objects.all()
+    if category_slug:
+        products = products.filter(category__slug=category_slug, category__main_category__slug=main_category_slug)
+    elif main_category_slug:
+        products = products.filter(category__main_category__slug=main_category_slug)
+    last = watermark(products)
+
+    parts = [last]
+    stamps = [last]
+    if request.GET.get('sort', '') == '':
+        # Перемешанный порядок меняется каждый час — новый сид, новая страница
+        seed = current_shuffle_seed()
+        parts.append(seed)
+        stamps.append(seed * SHUFFLE_PERIOD_SECONDS)
+    return build_validators(*parts, last_modified=stamps)
+
+
+def product_validators(request, id, slug):
+    product = Product.objects.filter(id=id).values('updated', 'category_id').first()
+    if product is None:
+        # Страница ответит 404 — валидаторы ни на что не повлияют
+        return build_validators('missing', id)
+    # «Похожие товары» — из той же категории
+    last = watermark(Product.objects.filter(category_id=product['category_id']))
+    return build_validators(product['updated'], last, last_modified=(product['updated'], last))
+
+
+def index_validators(request):
+    last = watermark(Product.objects.all())
+    return build_validators(last, last_modified=(last,))
+
+
+def discounts_validators(request, *args, **kwargs):
+    # Список акций и «похожие акции» на детальной странице строятся по всей таблице
+    last = watermark(Akchii.objects.all())
+    return build_validators(last, last_modified=(last,))
+
@@ -0,0 +1,224 @@
+import re
+from itertools import product
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import PHONE_COUNTRY_CODE, Customer, Order, phone_digits, prefix_filter
+from .search import WORD_RE
+
+# Поиск в CRM и админке заказов. На SQLite — таблицы FTS5 с rowid = id
+# записи, синхронизируются сигналами. В PostgreSQL таблиц нет: GIN-индексы
+# (миграции 0012, 0013) строятся прямо по core_customer и core_order
+
+# Триграммный индекс имён клиентов; в PostgreSQL — pg_trgm, и icontains использует его сам
+CUSTOMER_SEARCH_TABLE = 'core_customer_search'
+CUSTOMER_NAME_FIELDS = ('full_name', 'spouse_name')
+# Триграммы не находят подстроки короче трёх символов
+MIN_TRIGRAM_LENGTH = 3
+
+# Словарный индекс текстовых полей заказа (поиск по началу слов)
+ORDER_SEARCH_TABLE = 'core_order_search'
+ORDER_TEXT_FIELDS = ('full_name', 'address', 'card_message', 'comment')
+# То же выражение, что в GIN-индексе order_text_search_idx миграции 0013
+ORDER_TSVECTOR_SQL = (
+    "to_tsvector('simple', full_name || ' ' || address || ' ' || card_message || ' ' || comment)"
+)
+# Длиннее номер заказа быть не может, а int() такой строки переполнит столбец
+ORDER_ID_MAX_DIGITS = 18
+
+# Запрос из цифр, пробелов, скобок, плюса и дефиса считается телефоном
+PHONE_QUERY_RE = re.compile(r'^[0-9\s()+-]+$')
+MIN_PHONE_QUERY_DIGITS = 3
+
+
+def _fts_replace(conn, table, fields, objects):
+    rows = [(obj.pk, *(getattr(obj, field) for field in fields)) for obj in objects]
+    with conn.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES (%s{', %s' * len(fields)})", rows
+        )
+
+
+def _fts_delete(table, pk):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [pk])
+
+
+def _fts_rebuild(conn, table, fields, queryset, batch_size):
+    if conn.vendor != 'sqlite':
+        return 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+    total = 0
+    batch = []
+    for obj in queryset.only('id', *fields).order_by().iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            _fts_replace(conn, table, fields, batch)
+            total += len(batch)
+            batch = []
+    _fts_replace(conn, table, fields, batch)
+    total += len(batch)
+    return total
+
+
+def _fts_match(table, match):
+    return Q(pk__in=RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match]))
+
+
+def phone_query_filter(query, fields):
+    """
+    Поиск по телефону: начало номера («0555 12», «+996 555», «555 12») или
+    его последние цифры («12-34-56») в любом из полей fields (нормализованных).
+    """
+    typed = phone_digits(query)
+    # Хранится номер с кодом страны, а набирают его и с местным нулём, и без всего
+    if typed.startswith('0'):
+        starts = [PHONE_COUNTRY_CODE + typed[1:]]
+    elif typed.startswith(PHONE_COUNTRY_CODE):
+        starts = [typed]
+    else:
+        starts = [typed, PHONE_COUNTRY_CODE + typed]
+    condition = Q()
+    for field in fields:
+        for start in starts:
+            condition |= prefix_filter(field, start)
+        condition |= prefix_filter(f'{field}_reversed', typed[::-1])
+    return condition
+
+
+def name_query_words(query):
+    """Слова запроса: (длинные — для триграмм, короткие — одна-две буквы)"""
+    words = query.lower().split()
+    return (
+        [word for word in words if len(word) >= MIN_TRIGRAM_LENGTH],
+        [word for word in words if len(word) < MIN_TRIGRAM_LENGTH],
+    )
+
+
+def case_variants(text):
+    """
+    Все написания короткой строки в разном регистре: «ив» -> ив, иВ, Ив, ИВ.
+    LIKE и lower() в SQLite различают регистр кириллицы, а вариантов у
+    одной-двух букв не больше четырёх.
+    """
+    return sorted({''.join(chars) for chars in product(*({char.lower(), char.upper()} for char in text))})
+
+
+def _short_word_start(word):
+    """Имя клиента начинается с word без учёта регистра — диапазоны по индексу full_name"""
+    if connection.vendor == 'sqlite':
+        return Q(*[prefix_filter('full_name', variant) for variant in case_variants(word)], _connector=Q.OR)
+    return Q(full_name__istartswith=word)
+
+
+def _short_word_anywhere(word):
+    """word где-нибудь в имени клиента или супруга без учёта регистра"""
+    if connection.vendor == 'sqlite':
+        variants = case_variants(word)
+        return Q(*[
+            Q(**{f'{field}__contains': variant}) for field in CUSTOMER_NAME_FIELDS for variant in variants
+        ], _connector=Q.OR)
+    return Q(full_name__icontains=word) | Q(spouse_name__icontains=word)
+
+
+def customer_name_filter(query):
+    """
+    Подстроки имени клиента или супруга; все слова запроса должны встретиться.
+
+    Слова от трёх букв ищутся по триграммам. Короче триграммы не работают,
+    поэтому одно-двухбуквенные слова не отбрасываются, а проверяются
+    обычным сравнением среди уже найденных по длинным словам. Если длинных
+    слов нет, первое короткое ищется как начало имени по индексу full_name.
+    """
+    words, short_words = name_query_words(query)
+    if not words and not short_words:
+        return Q()
+
+    if not words:
+        condition = _short_word_start(short_words[0])
+        short_words = short_words[1:]
+    elif connection.vendor == 'sqlite':
+        # Каждое слово — фраза в кавычках: триграммы ищут её как подстроку
+        match = ' '.join('"{}"'.format(word.replace('"', '')) for word in words)
+        condition = _fts_match(CUSTOMER_SEARCH_TABLE, match)
+    else:
+        condition = Q()
+        for word in words:
+            condition &= Q(full_name__icontains=word) | Q(spouse_name__icontains=word)
+
+    for word in short_words:
+        condition &= _short_word_anywhere(word)
+    return condition
+
+
+def customer_search_filter(query):
+    query = query.strip()
+    if PHONE_QUERY_RE.match(query) and len(phone_digits(query)) >= MIN_PHONE_QUERY_DIGITS:
+        return phone_query_filter(query, ('phone_digits', 'spouse_phone_digits'))
+    return customer_name_filter(query)
+
+
+def order_search_filter(query):
+    """
+    Поиск заказа в админке: номер заказа и телефон — точное совпадение
+    (телефон в любом написании, см. phone_digits), иначе — начала слов
+    в ФИО, адресе, тексте открытки и комментарии.
+    """
+    query = query.strip()
+    number = query.lstrip('№#')
+    if PHONE_QUERY_RE.match(number) and len(phone_digits(number)) >= MIN_PHONE_QUERY_DIGITS or number.isdigit():
+        condition = Q(phone_digits=phone_digits(number))
+        if number.isdigit() and len(number) <= ORDER_ID_MAX_DIGITS:
+            condition |= Q(pk=int(number))
+        return condition
+
+    words = [word.lower() for word in WORD_RE.findall(query)]
+    if not words:
+        return Q(pk__in=[])
+    if connection.vendor == 'sqlite':
+        return _fts_match(ORDER_SEARCH_TABLE, ' '.join(f'"{word}"*' for word in words))
+    if connection.vendor == 'postgresql':
+        # В словах только буквы и цифры (WORD_RE) — операторов tsquery в них нет
+        return Q(pk__in=RawSQL(
+            f"SELECT id FROM core_order WHERE {ORDER_TSVECTOR_SQL} @@ to_tsquery('simple', %s)",
+            [' & '.join(f"{word}:*" for word in words)],
+        ))
+    condition = Q()
+    for word in words:
+        condition &= Q(*[Q(**{f'{field}__icontains': word}) for field in ORDER_TEXT_FIELDS], _connector=Q.OR)
+    return condition
+
+
+def index_customers(customers, using=None):
+    conn = using or connection
+    if conn.vendor == 'sqlite':
+        _fts_replace(conn, CUSTOMER_SEARCH_TABLE, CUSTOMER_NAME_FIELDS, customers)
+
+
+def unindex_customer(customer):
+    _fts_delete(CUSTOMER_SEARCH_TABLE, customer.pk)
+
+
+def rebuild_customer_index(model=Customer, using=None, batch_size=1000):
+    """Перестраивает триграммный индекс имён (только SQLite); возвращает число клиентов"""
+    return _fts_rebuild(using or connection, CUSTOMER_SEARCH_TABLE, CUSTOMER_NAME_FIELDS, model.objects.all(), batch_size)
+
+
+def index_orders(orders, using=None):
+    conn = using or connection
+    if conn.vendor == 'sqlite':
+        _fts_replace(conn, ORDER_SEARCH_TABLE, ORDER_TEXT_FIELDS, orders)
+
+
+def unindex_order(order):
+    _fts_delete(ORDER_SEARCH_TABLE, order.pk)
+
+
+def rebuild_order_index(model=Order, using=None, batch_size=1000):
+    """Перестраивает индекс текстовых полей заказов (только SQLite); возвращает число заказов"""
+    return _fts_rebuild(using or connection, ORDER_SEARCH_TABLE, ORDER_TEXT_FIELDS, model.objects.all(), batch_size)
@@ -0,0 +1,209 @@
+import hashlib
+import io
+import logging
+import os
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .storage import digest_from_name
+
+try:
+    # Необязательный плагин: добавляет AVIF в сборки Pillow без libavif
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+# Ширины рендишенов: карточка каталога 250px на обычном и 2x экране, мобильная
+# карточка на половину экрана, детальная страница
+RENDITION_WIDTHS = (320, 640, 960)
+
+# (расширение, MIME, формат Pillow, параметры сохранения) — от лучшего к запасному
+RENDITION_FORMATS = (
+    ('avif', 'image/avif', 'AVIF', {'quality': 50}),
+    ('webp', 'image/webp', 'WEBP', {'quality': 80, 'method': 6}),
+    ('jpg', 'image/jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+MANIFEST_CACHE_PREFIX = 'renditions'
+MANIFEST_TIMEOUT = 24 * 60 * 60
+# Общий кэш — таблица в БД или Redis, то есть запрос на каждую картинку страницы.
+# Содержимое файла с именем по хэшу (ContentAddressedStorage) не меняется, как и
+# набор его рендишенов, поэтому готовые манифесты таких файлов процесс помнит сам
+LOCAL_MANIFEST_LIMIT = 10_000
+_local_manifests = {}
+
+# Миниатюры для списка товаров в админке: 100px покрывают колонку 50px на 2x экране
+ADMIN_THUMBNAIL_SIZE = 100
+ADMIN_THUMBNAIL_DIR = 'thumbs'
+ADMIN_THUMBNAIL_CACHE_PREFIX = 'admin_thumb'
+
+logger = logging.getLogger(__name__)
+
+
+def supported_formats():
+    """Форматы, которые умеет кодировать установленный Pillow"""
+    return [fmt for fmt in RENDITION_FORMATS if fmt[0] != 'avif' or features.check('avif')]
+
+
+def rendition_name(name, width, ext):
+    """Рендишен лежит рядом с оригиналом: products/rose.png -> products/rose.w640.webp"""
+    stem, _ = os.path.splitext(name)
+    return f"{stem}.w{width}.{ext}"
+
+
+def target_widths(original_width):
+    """Ширины не больше оригинала; слишком маленький оригинал получает одну ширину"""
+    widths = [width for width in RENDITION_WIDTHS if width <= original_width]
+    return widths or [original_width]
+
+
+def _flatten(image):
+    """JPEG не умеет прозрачность — подкладываем белый фон"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def generate_renditions(name, storage=default_storage, force=False, cache_manifest=True):
+    """
+    Создаёт рендишены изображения во всех ширинах и форматах.
+    Возвращает манифест {ext: [ширины]} и кладёт его в кэш (если cache_manifest).
+    """
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    manifest = {}
+    for width in target_widths(image.width):
+        height = round(image.height * width / image.width)
+        resized = _flatten(image).resize((width, height), Image.LANCZOS)
+        for ext, _, pil_format, options in supported_formats():
+            target = rendition_name(name, width, ext)
+            if force or not storage.exists(target):
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                if storage.exists(target):
+                    storage.delete(target)
+                storage.save(target, ContentFile(buffer.getvalue()))
+            manifest.setdefault(ext, []).append(width)
+
+    _local_manifests.pop(name, None)
+    if cache_manifest:
+        cache.set(f"{MANIFEST_CACHE_PREFIX}:{name}", manifest, MANIFEST_TIMEOUT)
+    return manifest
+
+
+def get_renditions(name, storage=default_storage):
+    """
+    Манифест готовых рендишенов {ext: [ширины]} без чтения самих файлов.
+    Проверка наличия на диске делается один раз и кэшируется.
+    """
+    manifest = _local_manifests.get(name)
+    if manifest is not None:
+        return manifest
+    key = f"{MANIFEST_CACHE_PREFIX}:{name}"
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = {}
+        for ext, _, _, _ in supported_formats():
+            widths = [
+                width for width in RENDITION_WIDTHS
+                if storage.exists(rendition_name(name, width, ext))
+            ]
+            if widths:
+                manifest[ext] = widths
+        cache.set(key, manifest, MANIFEST_TIMEOUT)
+    if manifest.get('jpg') and digest_from_name(name):
+        if len(_local_manifests) >= LOCAL_MANIFEST_LIMIT:
+            _local_manifests.clear()
+        _local_manifests[name] = manifest
+    return manifest
+
+
+def ensure_renditions(name, storage=default_storage):
+    """Генерирует рендишены, если для этого файла их ещё нет"""
+    if not name:
+        return
+    jpg_widths = get_renditions(name, storage).get('jpg')
+    # Проверка по диску, а не только по манифесту: sweep_media мог удалить
+    # рендишены файла-сироты, а теперь ту же картинку загрузили снова
+    if jpg_widths and storage.exists(rendition_name(name, jpg_widths[-1], 'jpg')):
+        return
+    try:
+        generate_renditions(name, storage)
+    except (OSError, ValueError):
+        # Битый или неподдерживаемый файл не должен ломать сохранение товара
+        logger.warning("Не удалось создать рендишены для %s", name, exc_info=True)
+
+
+def content_hash(name, storage=default_storage):
+    """SHA-256 содержимого файла, читается кусками"""
+    known = digest_from_name(name)
+    if known:
+        # Файл из ContentAddressedStorage: хэш уже в имени
+        return known
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as source:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def admin_thumbnail_name(digest, size=ADMIN_THUMBNAIL_SIZE):
+    """thumbs/ab/abcdef….100.jpg — одинаковые картинки делят одну миниатюру"""
+    return f"{ADMIN_THUMBNAIL_DIR}/{digest[:2]}/{digest}.{size}.jpg"
+
+
+def generate_admin_thumbnail(name, storage=default_storage, size=ADMIN_THUMBNAIL_SIZE):
+    """
+    Создаёт миниатюру по хэшу содержимого и возвращает её имя.
+    Если миниатюра с таким хэшем уже есть, оригинал повторно не декодируется.
+    """
+    target = admin_thumbnail_name(content_hash(name, storage), size)
+    if not storage.exists(target):
+        with storage.open(name, 'rb') as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image = _flatten(image)
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80, optimize=True)
+        storage.save(target, ContentFile(buffer.getvalue()))
+    cache.set(f"{ADMIN_THUMBNAIL_CACHE_PREFIX}:{name}", target, None)
+    return target
+
+
+def admin_thumbnail_urls(names, storage=default_storage):
+    """
+    URL миниатюр для админки, {имя файла: URL или None}. Связка «файл -> хэш ->
+    миниатюра» хранится в кэше без срока и читается одним get_many на страницу,
+    поэтому список товаров не читает файлы с диска и не ходит в кэш на каждую
+    строку; на промахе кэша (первый показ, сброс кэша) миниатюра строится один раз.
+    """
+    names = {name for name in names if name}
+    cached = cache.get_many([f"{ADMIN_THUMBNAIL_CACHE_PREFIX}:{name}" for name in names])
+    urls = {}
+    for name in names:
+        target = cached.get(f"{ADMIN_THUMBNAIL_CACHE_PREFIX}:{name}")
+        if target is None:
+            try:
+                target = generate_admin_thumbnail(name, storage)
+            except (OSError, ValueError):
+                logger.warning("Не удалось создать миниатюру для %s", name, exc_info=True)
+                urls[name] = None
+                continue
+        urls[name] = storage.url(target)
+    return urls
+
+
+def admin_thumbnail_url(name, storage=default_storage):
+    """URL миниатюры одного файла для админки (см. admin_thumbnail_urls)"""
+    if not name:
+        return None
+    return admin_thumbnail_urls([name], storage)[name]
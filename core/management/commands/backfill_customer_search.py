@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.crm_search import rebuild_customer_index
+from core.models import Customer, month_day, phone_digits
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет нормализованные телефоны и дни рождения (MMDD) клиентов и перестраивает '
+        'индекс поиска по именам в CRM. Нужен после импорта или update() в обход save(). '
+        'Для заказов — backfill_order_search'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = [
+            'phone_digits', 'phone_digits_reversed', 'spouse_phone_digits', 'spouse_phone_digits_reversed',
+            'birthday_mmdd', 'spouse_birthday_mmdd',
+        ]
+        changed = []
+        updated = 0
+        customers = Customer.objects.only(
+            'id', 'phone', 'spouse_phone', 'birthday', 'spouse_birthday', *fields
+        ).order_by('pk')
+        for customer in customers.iterator(chunk_size=batch_size):
+            before = [getattr(customer, field) for field in fields]
+            customer.phone_digits = phone_digits(customer.phone)
+            customer.phone_digits_reversed = customer.phone_digits[::-1]
+            customer.spouse_phone_digits = phone_digits(customer.spouse_phone)
+            customer.spouse_phone_digits_reversed = customer.spouse_phone_digits[::-1]
+            customer.birthday_mmdd = month_day(customer.birthday)
+            customer.spouse_birthday_mmdd = month_day(customer.spouse_birthday)
+            if [getattr(customer, field) for field in fields] != before:
+                changed.append(customer)
+            if len(changed) >= batch_size:
+                updated += Customer.objects.bulk_update(changed, fields)
+                changed = []
+        if changed:
+            updated += Customer.objects.bulk_update(changed, fields)
+
+        with transaction.atomic():
+            indexed = rebuild_customer_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Обновлено клиентов: {updated}, имён в индексе: {indexed}"
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.crm_search import rebuild_order_index
+from core.models import Order, phone_digits
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет нормализованные телефоны заказов и перестраивает индекс поиска '
+        'заказов в админке. Нужен после импорта или update() в обход save()'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        changed = []
+        updated = 0
+        for order in Order.objects.only('id', 'phone', 'phone_digits').order_by('pk').iterator(chunk_size=batch_size):
+            digits = phone_digits(order.phone)
+            if digits != order.phone_digits:
+                order.phone_digits = digits
+                changed.append(order)
+            if len(changed) >= batch_size:
+                updated += Order.objects.bulk_update(changed, ['phone_digits'])
+                changed = []
+        if changed:
+            updated += Order.objects.bulk_update(changed, ['phone_digits'])
+
+        with transaction.atomic():
+            indexed = rebuild_order_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Обновлено заказов: {updated}, заказов в индексе: {indexed}"
+        ))
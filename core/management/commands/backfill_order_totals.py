@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Order
+from core.services import recalculate_order_totals
+
+
+class Command(BaseCommand):
+    help = 'Заполняет Order.total_price и Order.items_count по позициям заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            updated += recalculate_order_totals(ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано заказов: {updated}"))
@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.middleware import brotli, compress_body, minify_html
+from core.models import Akchii, Product
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 6, 11)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает минификацию и уровни gzip/brotli на реальных страницах: '
+        'сколько байт экономит каждый вариант и сколько CPU это стоит'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Страница для замера (можно несколько раз); по умолчанию основные страницы магазина')
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов на каждый замер')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        client = Client()
+        for url in options['urls'] or self.default_urls():
+            # Без Accept-Encoding и без HtmlMinifyMiddleware — исходный HTML шаблона
+            with override_settings(MIDDLEWARE=[
+                name for name in settings.MIDDLEWARE if name != 'core.middleware.HtmlMinifyMiddleware'
+            ]):
+                response = client.get(url)
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f"{url}: HTTP {response.status_code}, пропущено"))
+                continue
+            html = response.content.decode(response.charset)
+            body = html.encode('utf-8')
+
+            self.stdout.write(f"\n{url} — {len(body) / 1024:.1f} КБ без сжатия")
+            self.stdout.write(f"{'вариант':<16} {'байт':>9} {'экономия':>9} {'мс':>8}")
+
+            elapsed, minified = self.measure(lambda: minify_html(html), repeat)
+            minified = minified.encode('utf-8')
+            self.report('minify', len(body), len(minified), elapsed)
+
+            for level in GZIP_LEVELS:
+                elapsed, compressed = self.measure(lambda: compress_body(minified, 'gzip', level), repeat)
+                self.report(f"gzip -{level}", len(body), len(compressed), elapsed)
+            if brotli is None:
+                self.stdout.write('brotli не установлен — варианты br пропущены')
+                continue
+            for quality in BROTLI_QUALITIES:
+                elapsed, compressed = self.measure(lambda: compress_body(minified, 'br', quality), repeat)
+                self.report(f"br q{quality}", len(body), len(compressed), elapsed)
+
+    def default_urls(self):
+        urls = [reverse('index'), reverse('catalog'), reverse('discounts')]
+        product = Product.objects.filter(available=True).only('id', 'slug').first()
+        if product:
+            urls.append(reverse('product_detail', args=[product.id, product.slug]))
+        akchii = Akchii.objects.filter(available=True).only('id', 'slug').first()
+        if akchii:
+            urls.append(reverse('discount_product_detail', args=[akchii.id, akchii.slug]))
+        return urls
+
+    def measure(self, func, repeat):
+        """Среднее время вызова в миллисекундах и результат"""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - start) * 1000 / repeat, result
+
+    def report(self, label, original, size, elapsed):
+        saved = 100 * (original - size) / original
+        self.stdout.write(f"{label:<16} {size:>9} {saved:>8.1f}% {elapsed:>8.2f}")
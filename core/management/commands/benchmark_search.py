@@ -0,0 +1,142 @@
+import math
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import Category, MainCategory, Product
+from core.search import SEARCH_RESULTS_LIMIT, WORD_RE, get_backend, index_objects, search_products
+
+DEFAULT_QUERIES = (
+    'розы', 'красные розы', 'тюльпан', 'букет из пионов', 'гортензия белая',
+    'эвкалипт', 'торт шоколадный', 'мишка', 'подарок маме', 'орхидея в горшке',
+)
+NAME_HEADS = ('Букет из', 'Корзина из', 'Композиция из', 'Коробка с', 'Охапка')
+FLOWERS = (
+    'роз', 'тюльпанов', 'пионов', 'хризантем', 'лилий', 'орхидей', 'гортензий',
+    'эустом', 'ромашек', 'гербер', 'альстромерий', 'ирисов',
+)
+COLORS = ('красных', 'белых', 'розовых', 'жёлтых', 'кремовых', 'синих', 'персиковых')
+EXTRAS = ('Торт шоколадный', 'Торт медовый', 'Мишка плюшевый', 'Зайка мягкий', 'Орхидея в горшке')
+# Слова описаний, от частых к редким: выбираются по закону Ципфа, как в живом тексте
+DESCRIPTION_WORDS = (
+    'нежный подарок цветы букет доставка упаковка любимой маме яркий свежие лента зелень '
+    'день рождения праздник Бишкек открытка аромат стильный эвкалипт сезонные свадьба юбилей '
+    'коллегам утро весна лето осень зима фисташка крафт бумага фетр шляпная коробка сердце '
+    'признание извинение благодарность выпускной учителю начальнику подруге сестре бабушке '
+    'дочке пастельные тона контраст акцент минимализм классика французский стиль монобукет '
+    'сборный высокий компактный пышный воздушный лёгкий насыщенные сочные оттенки'
+).split()
+DESCRIPTION_WEIGHTS = [1 / rank for rank in range(1, len(DESCRIPTION_WORDS) + 1)]
+
+
+class BenchmarkRollback(Exception):
+    pass
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку поиска на синтетическом каталоге (по умолчанию 100 тыс. товаров) '
+        'и сравнивает с наивным icontains. Всё создаётся в транзакции и откатывается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000, help='Сколько товаров сгенерировать')
+        parser.add_argument('--repeat', type=int, default=30, help='Повторов каждого запроса к индексу')
+        parser.add_argument('--naive-repeat', type=int, default=3, help='Повторов наивного icontains (0 — не мерить)')
+        parser.add_argument('--query', action='append', dest='queries', help='Запрос (можно несколько раз)')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError('Полнотекстовый поиск поддерживается только на SQLite (FTS5) и PostgreSQL')
+        try:
+            with transaction.atomic():
+                self.fill(backend, options['products'])
+                self.measure(options['queries'] or DEFAULT_QUERIES, options['repeat'], options['naive_repeat'])
+                raise BenchmarkRollback
+        except BenchmarkRollback:
+            self.stdout.write('Тестовые товары удалены (транзакция откачена)')
+
+    def fill(self, backend, count):
+        rng = random.Random(42)
+        main_category = MainCategory.objects.create(name='Бенчмарк поиска', slug='benchmark-search')
+        category = Category.objects.create(main_category=main_category, name='Бенчмарк', slug='benchmark-search')
+
+        start = time.perf_counter()
+        indexing = 0.0
+        for offset in range(0, count, 1000):
+            batch = []
+            for number in range(offset, min(offset + 1000, count)):
+                if rng.random() < 0.15:
+                    name = rng.choice(EXTRAS)
+                else:
+                    name = f"{rng.choice(NAME_HEADS)} {rng.randint(5, 101)} {rng.choice(COLORS)} {rng.choice(FLOWERS)}"
+                batch.append(Product(
+                    category=category,
+                    product_type='flower',
+                    name=name,
+                    search_name=name.lower(),
+                    slug=f"benchmark-search-{number}",
+                    image='products/benchmark.jpg',
+                    description=' '.join(rng.choices(DESCRIPTION_WORDS, DESCRIPTION_WEIGHTS, k=25)).capitalize(),
+                    flowers_included=', '.join(rng.sample(FLOWERS, 3)),
+                    price=Decimal(rng.randint(500, 20000)),
+                ))
+            batch = Product.objects.bulk_create(batch)
+            index_start = time.perf_counter()
+            index_objects(batch, 'product', backend)
+            indexing += time.perf_counter() - index_start
+
+        self.stdout.write(
+            f"Создано товаров: {count} за {time.perf_counter() - start:.1f} с, "
+            f"из них индексация {indexing:.1f} с ({count / max(indexing, 1e-9):.0f} товаров/с)"
+        )
+
+    def measure(self, queries, repeat, naive_repeat):
+        self.stdout.write(
+            f"\n{'запрос':<22} {'найдено':>8} {'p50 мс':>8} {'p95 мс':>8} {'max мс':>8} {'icontains p95':>14}"
+        )
+        all_timings = []
+        for query in queries:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results = search_products(query)
+                timings.append((time.perf_counter() - start) * 1000)
+            all_timings += timings
+
+            naive = ''
+            if naive_repeat:
+                naive_timings = []
+                for _ in range(naive_repeat):
+                    start = time.perf_counter()
+                    list(self.naive_search(query))
+                    naive_timings.append((time.perf_counter() - start) * 1000)
+                naive = f"{percentile(naive_timings, 0.95):.1f}"
+
+            self.stdout.write(
+                f"{query:<22} {len(results):>8} {percentile(timings, 0.5):>8.2f} "
+                f"{percentile(timings, 0.95):>8.2f} {max(timings):>8.2f} {naive:>14}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"\nВсе запросы: p50 {percentile(all_timings, 0.5):.2f} мс, p95 {percentile(all_timings, 0.95):.2f} мс"
+        ))
+
+    def naive_search(self, query):
+        """То, что пришлось бы делать без индекса: icontains по всем текстовым полям"""
+        condition = Q()
+        for word in WORD_RE.findall(query):
+            condition &= (
+                Q(name__icontains=word) | Q(description__icontains=word)
+                | Q(flowers_included__icontains=word) | Q(ingredients__icontains=word)
+            )
+        return Product.objects.filter(condition, available=True)[:SEARCH_RESULTS_LIMIT]
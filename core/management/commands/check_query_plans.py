@@ -0,0 +1,74 @@
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.birthdays import upcoming_birthdays
+from core.crm_search import customer_search_filter, order_search_filter
+from core.models import Akchii, Customer, Order, Product, Review, final_price_expression
+
+# Полный проход по таблице без индекса: "SCAN core_product", но не
+# "SCAN core_product USING INDEX ..." (обход индекса в нужном порядке)
+# и не "SCAN core_customer_search VIRTUAL TABLE INDEX ..." (поиск в FTS5)
+TABLE_SCAN_RE = re.compile(r'\bSCAN (core_\w+)\b(?! USING| VIRTUAL TABLE)')
+
+
+def hot_queries():
+    """
+    Запросы в той же форме, в какой их выполняют представления.
+    На тестовой БД их проверяет core.tests.QueryPlanTests, команда — на живых данных.
+    """
+    available = Product.objects.filter(available=True)
+    return {
+        'catalog: shuffle ids (all)': available.order_by().values_list('id', 'skidka', 'price'),
+        'catalog: shuffle ids (category + price)': available.filter(
+            category_id=1, price__gte=100, price__lte=5000
+        ).order_by().values_list('id', 'skidka', 'price'),
+        'catalog: shuffle ids (main category)': available.filter(
+            category__main_category_id=1
+        ).order_by().values_list('id', 'skidka', 'price'),
+        'catalog: sort=new page': available.order_by('-created', '-id')[:13],
+        'catalog: sort=price page': available.filter(category_id=1).annotate(
+            sort_price=final_price_expression()
+        ).order_by('sort_price', 'id')[:13],
+        'catalog: page by pk': available.filter(id__in=[1, 2, 3]),
+        'index: featured': Product.objects.filter(featured=True)[:8],
+        'index: reviews': Review.objects.filter(approved=True)[:5],
+        'discounts: page': Akchii.objects.filter(
+            skidka__isnull=False, available=True
+        ).order_by('-created', '-id')[:13],
+        'crm: customers by phone start': Customer.objects.filter(customer_search_filter('0555 12'))[:20],
+        'crm: customers by phone tail': Customer.objects.filter(customer_search_filter('34-56'))[:20],
+        'crm: customers by name': Customer.objects.filter(customer_search_filter('Айгуль'))[:20],
+        'crm: customers by name start': Customer.objects.filter(customer_search_filter('ай'))[:20],
+        'report: birthdays today': upcoming_birthdays(today=date(2025, 2, 28)),
+        'crm: birthdays over new year': upcoming_birthdays(days=7, today=date(2025, 12, 28)),
+        'admin: orders by status': Order.objects.filter(status='new').order_by('-created_date')[:100],
+        'admin: order search by number or phone': Order.objects.filter(
+            order_search_filter('0555 123 456')
+        ).order_by('-created_date')[:100],
+        'admin: order search by text': Order.objects.filter(
+            order_search_filter('Айгуль Манаса')
+        ).order_by('-created_date')[:100],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Печатает EXPLAIN QUERY PLAN горячих запросов и падает, если появился полный скан таблицы'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов написана под SQLite (EXPLAIN QUERY PLAN)')
+
+        failures = []
+        for label, queryset in hot_queries().items():
+            plan = queryset.explain()
+            self.stdout.write(f"{label}:\n{plan}\n")
+            scans = TABLE_SCAN_RE.findall(plan)
+            if scans:
+                failures.append(f"{label}: {', '.join(scans)}")
+
+        if failures:
+            raise CommandError('Полный скан таблицы:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Все горячие запросы идут по индексам'))
@@ -0,0 +1,244 @@
+import os
+import posixpath
+import re
+import textwrap
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Куда складываются бандлы внутри static/ — дальше их хэширует и сжимает collectstatic
+BUNDLE_DIR = 'css/pages'
+# Сколько байт разметки от начала страницы считаем первым экраном
+ABOVE_THE_FOLD_BYTES = 2000
+
+STYLE_RE = re.compile(r'<style(?P<attrs>[^>]*)>(?P<css>.*?)</style>[ \t]*\n?', re.S)
+COMMENT_TAG_RE = re.compile(r'{%\s*comment\s*%}.*?{%\s*endcomment\s*%}', re.S)
+STATIC_TAG_RE = re.compile(r'''{%\s*static\s+['"]([^'"]+)['"]\s*%}''')
+TEMPLATE_SYNTAX_RE = re.compile(r'{[{%#]')
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+EXTENDS_RE = re.compile(r'{%\s*extends\s+[\'"]([^\'"]+)[\'"]\s*%}')
+CONTENT_BLOCK_RE = re.compile(r'{%\s*block\s+content\s*%}')
+INCLUDE_RE = re.compile(r'''{%\s*include\s+['"]([^'"]+)['"][^%]*%}''')
+CLASS_ATTR_RE = re.compile(r'\bclass\s*=\s*"([^"]*)"')
+ID_ATTR_RE = re.compile(r'\bid\s*=\s*"([^"]*)"')
+TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)')
+TEMPLATE_TAG_RE = re.compile(r'{[{%].*?[%}]}')
+PSEUDO_RE = re.compile(r'::?[\w-]+(\([^)]*\))?|\[[^\]]*\]')
+SELECTOR_TOKEN_RE = re.compile(r'([.#]?)(-?[_a-zA-Z][\w-]*)')
+
+
+def split_rules(css):
+    """
+    Делит CSS на правила верхнего уровня: [(прелюдия, тело)].
+    Для @import и подобных тело — None. Вложенные блоки остаются в теле.
+    """
+    rules, depth, start, prelude_end, quote = [], 0, 0, 0, None
+    for position, char in enumerate(css):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude_end = position
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth < 0:
+                raise ValueError('лишняя закрывающая скобка')
+            if depth == 0:
+                rules.append((css[start:prelude_end].strip(), css[prelude_end + 1:position]))
+                start = position + 1
+        elif char == ';' and depth == 0:
+            rules.append((css[start:position + 1].strip(), None))
+            start = position + 1
+    if depth or css[start:].strip():
+        raise ValueError('незакрытое правило')
+    return rules
+
+
+def selector_is_critical(selector, tokens):
+    """Все классы, id и теги селектора встречаются в разметке первого экрана"""
+    selector = PSEUDO_RE.sub('', selector)
+    for kind, name in SELECTOR_TOKEN_RE.findall(selector):
+        token = f"{kind}{name}" if kind else name.lower()
+        if token not in tokens:
+            return False
+    return True
+
+
+def critical_rules(css, tokens):
+    """Возвращает (критический CSS, всего правил, из них критических)"""
+    parts, total, critical = [], 0, 0
+    for prelude, body in split_rules(css):
+        if body is None:
+            continue
+        if prelude.startswith(('@media', '@supports')):
+            inner, inner_total, inner_critical = critical_rules(body, tokens)
+            total += inner_total
+            critical += inner_critical
+            if inner:
+                parts.append(f"{prelude} {{\n{inner}\n}}")
+        elif prelude.startswith('@'):
+            # @keyframes, @font-face — приедут с бандлом
+            total += 1
+        else:
+            total += 1
+            if any(selector_is_critical(selector, tokens) for selector in prelude.split(',')):
+                critical += 1
+                parts.append(f"{prelude} {{ {' '.join(body.split())} }}")
+    return '\n'.join(parts), total, critical
+
+
+class Command(BaseCommand):
+    help = (
+        'Выносит инлайновые <style> из шаблонов core в static/css/pages/*.css. '
+        'Инлайном остаются только правила первого экрана, бандл подключается без '
+        'блокировки отрисовки. Печатает, на сколько байт уменьшился HTML каждой страницы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не записывать')
+
+    def handle(self, *args, **options):
+        self.templates_dir = os.path.join(apps.get_app_config('core').path, 'templates')
+        self.static_dir = str(settings.STATICFILES_DIRS[0])
+        dry_run = options['dry_run']
+
+        saved, parents = {}, {}
+        for root, _, files in os.walk(self.templates_dir):
+            for filename in sorted(files):
+                if not filename.endswith('.html'):
+                    continue
+                name = os.path.relpath(os.path.join(root, filename), self.templates_dir).replace(os.sep, '/')
+                source = self.read(name)
+                extends = EXTENDS_RE.search(source)
+                parents[name] = extends.group(1) if extends else None
+                result = self.extract(name, source, dry_run)
+                if result is not None:
+                    saved[name] = result
+
+        self.stdout.write(f"\n{'страница':<44} {'было':>9} {'стало':>9} {'экономия':>9}")
+        for name in sorted(parents):
+            # Экономия страницы складывается из её шаблона, родителей и общих include
+            chain, current = [], name
+            while current:
+                chain.append(current)
+                current = parents.get(current)
+            if len(chain) < 2:
+                continue
+            chain += [include for base in chain for include in INCLUDE_RE.findall(self.read(base))]
+            before = sum(saved[item][0] for item in chain if item in saved)
+            after = sum(saved[item][1] for item in chain if item in saved)
+            if before != after:
+                self.stdout.write(
+                    f"{name:<44} {before / 1024:>7.1f}КБ {after / 1024:>7.1f}КБ {(before - after) / 1024:>7.1f}КБ"
+                )
+
+    def read(self, name):
+        path = os.path.join(self.templates_dir, name)
+        if not os.path.exists(path):
+            return ''
+        with open(path, encoding='utf-8') as template_file:
+            return template_file.read()
+
+    def above_the_fold(self, source, depth=0):
+        """Разметка первого экрана: начало блока content или всё до него у базового шаблона"""
+        match = CONTENT_BLOCK_RE.search(source)
+        if EXTENDS_RE.search(source) and match:
+            markup = STYLE_RE.sub('', source[match.end():])[:ABOVE_THE_FOLD_BYTES]
+        elif match:
+            markup = source[:match.start()]
+        else:
+            markup = source
+        if depth < 2:
+            markup = INCLUDE_RE.sub(lambda m: self.above_the_fold(self.read(m.group(1)), depth + 1), markup)
+        return markup
+
+    def markup_tokens(self, markup):
+        markup = STYLE_RE.sub('', markup)
+        tokens = {'html', 'body'}
+        for value in CLASS_ATTR_RE.findall(markup):
+            tokens.update(f".{css_class}" for css_class in TEMPLATE_TAG_RE.sub(' ', value).split())
+        for value in ID_ATTR_RE.findall(markup):
+            if not TEMPLATE_SYNTAX_RE.search(value):
+                tokens.add(f"#{value.strip()}")
+        tokens.update(tag.lower() for tag in TAG_RE.findall(markup))
+        return tokens
+
+    def extract(self, name, source, dry_run):
+        """Возвращает (байт CSS в шаблоне было, стало) или None, если выносить нечего"""
+        blocks = [m for m in STYLE_RE.finditer(source) if 'data-critical' not in m.group('attrs')]
+        if not blocks:
+            return None
+
+        bundle = f"{BUNDLE_DIR}/{name[:-len('.html')]}.css"
+        bundle_dir = posixpath.dirname(bundle)
+        static_paths = set()
+        css_parts = []
+        for block in blocks:
+            css = COMMENT_TAG_RE.sub('', block.group('css'))
+            static_paths.update(STATIC_TAG_RE.findall(css))
+            css = STATIC_TAG_RE.sub(lambda m: posixpath.relpath(m.group(1), bundle_dir), css)
+            if TEMPLATE_SYNTAX_RE.search(css):
+                self.stdout.write(self.style.WARNING(f"{name}: в <style> есть шаблонные теги, пропущен"))
+                return None
+            css_parts.append(textwrap.dedent(css).strip('\n'))
+        bundle_css = '\n\n'.join(css_parts)
+
+        try:
+            critical, total, critical_count = critical_rules(
+                CSS_COMMENT_RE.sub('', bundle_css), self.markup_tokens(self.above_the_fold(source))
+            )
+        except ValueError as e:
+            self.stdout.write(self.style.WARNING(f"{name}: не удалось разобрать CSS ({e}), пропущен"))
+            return None
+
+        before = sum(len(block.group(0).encode('utf-8')) for block in blocks)
+        if critical_count == total:
+            self.stdout.write(f"{name}: весь CSS относится к первому экрану, оставлен инлайном")
+            return None
+
+        # В инлайне относительные url() не работают — возвращаем {% static %}
+        for path in static_paths:
+            critical = critical.replace(posixpath.relpath(path, bundle_dir), f"{{% static '{path}' %}}")
+
+        replacement = ''
+        if critical:
+            replacement += f"<style data-critical>\n{critical}\n</style>\n"
+        link_tag = f"{{% deferred_stylesheet '{bundle}' %}}"
+        # Бандл после критических правил: он содержит их же в исходном порядке,
+        # поэтому итоговый каскад совпадает с тем, что был в шаблоне
+        if link_tag not in source:
+            replacement += f"{link_tag}\n"
+        after = len(replacement.encode('utf-8'))
+
+        new_source = source[:blocks[0].start()] + replacement + source[blocks[0].end():]
+        for block in blocks[1:]:
+            new_source = new_source.replace(block.group(0), '', 1)
+        if '{% load assets %}' not in new_source:
+            extends = EXTENDS_RE.search(new_source)
+            position = new_source.index('\n', extends.end()) + 1 if extends else 0
+            new_source = new_source[:position] + '{% load assets %}\n' + new_source[position:]
+        if static_paths and critical and '{% load static %}' not in new_source.replace('{%load static%}', '{% load static %}'):
+            new_source = new_source.replace('{% load assets %}\n', '{% load assets %}\n{% load static %}\n', 1)
+
+        self.stdout.write(
+            f"{name}: правил {total}, в инлайне {critical_count}; "
+            f"{before / 1024:.1f}КБ -> {after / 1024:.1f}КБ, бандл {bundle}"
+        )
+        if dry_run:
+            return before, after
+
+        bundle_path = os.path.join(self.static_dir, *bundle.split('/'))
+        os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+        mode = 'a' if os.path.exists(bundle_path) else 'w'
+        with open(bundle_path, mode, encoding='utf-8') as bundle_file:
+            if mode == 'w':
+                bundle_file.write(f"/* Стили шаблона {name} */\n\n")
+            bundle_file.write(bundle_css + '\n')
+        with open(os.path.join(self.templates_dir, name), 'w', encoding='utf-8') as template_file:
+            template_file.write(new_source)
+        return before, after
@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.images import MANIFEST_CACHE_PREFIX, MANIFEST_TIMEOUT, generate_renditions
+from core.models import Akchii, Product
+
+
+def _render(name, force):
+    # Выполняется в дочернем процессе: только файлы, без обращения к БД —
+    # в том числе к кэшу, который тоже может быть таблицей в ней
+    try:
+        return name, generate_renditions(name, force=force, cache_manifest=False), ''
+    except (OSError, ValueError) as e:
+        return name, None, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Создаёт рендишены (AVIF/WebP/JPEG в нескольких ширинах) для уже загруженных изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию — по числу ядер)')
+        parser.add_argument('--force', action='store_true', help='Пересоздать уже существующие рендишены')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model in (Product, Akchii):
+            names.update(name for name in model.objects.values_list('image', flat=True) if name)
+
+        # Дочерние процессы не должны унаследовать открытые соединения с БД
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(_render, name, options['force']) for name in sorted(names)]
+            for future in as_completed(futures):
+                name, manifest, error = future.result()
+                if manifest is None:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                    continue
+                # Манифест в общий кэш пишет один процесс: с DatabaseCache на SQLite
+                # параллельные записи из дочерних процессов упирались бы в блокировку БД
+                cache.set(f"{MANIFEST_CACHE_PREFIX}:{name}", manifest, MANIFEST_TIMEOUT)
+                done += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Готово: {done}, с ошибками: {failed}"))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправляет уведомления из очереди NotificationOutbox в Telegram'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, а не один проход')
+        parser.add_argument('--interval', type=float, default=5.0, help='Пауза между проходами, сек')
+        parser.add_argument('--limit', type=int, default=50, help='Размер пачки за один захват')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = drain_outbox(limit=options['limit'])
+            if processed:
+                self.stdout.write(f"Обработано уведомлений: {processed}")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
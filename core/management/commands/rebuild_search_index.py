@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает полнотекстовый индекс товаров и акций. Нужен после '
+        'массового update() или загрузки данных в обход сигналов'
+    )
+
+    def handle(self, *args, **options):
+        if get_backend() is None:
+            raise CommandError('Полнотекстовый поиск поддерживается только на SQLite (FTS5) и PostgreSQL')
+        start = time.perf_counter()
+        with transaction.atomic():
+            total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Проиндексировано: {total} за {time.perf_counter() - start:.1f} с"
+        ))
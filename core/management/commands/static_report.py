@@ -0,0 +1,63 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core.static_assets import size_budget
+
+
+class Command(BaseCommand):
+    help = (
+        'Отчёт о размере собранной статики (после collectstatic). '
+        'Завершается с ошибкой, если файл превышает бюджет STATIC_SIZE_BUDGET'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Включить статику сторонних приложений (admin и т.п.)')
+
+    def handle(self, *args, **options):
+        hashed_files, _ = staticfiles_storage.load_manifest()
+        if not hashed_files:
+            raise CommandError('Манифест статики не найден — сначала выполните collectstatic')
+
+        over_budget = []
+        total_raw = total_transfer = 0
+        self.stdout.write(f"{'файл':<48} {'размер':>9} {'gzip':>9} {'br':>9} {'бюджет':>9}")
+        for name, hashed_name in sorted(hashed_files.items()):
+            # По умолчанию проверяются только наши файлы из STATICFILES_DIRS
+            if not options['all'] and not any(
+                os.path.exists(os.path.join(directory, name)) for directory in settings.STATICFILES_DIRS
+            ):
+                continue
+            path = staticfiles_storage.path(hashed_name)
+            if not os.path.exists(path):
+                continue
+            raw = os.path.getsize(path)
+            gz = os.path.getsize(path + '.gz') if os.path.exists(path + '.gz') else None
+            br = os.path.getsize(path + '.br') if os.path.exists(path + '.br') else None
+            # Для текста важен размер по сети — лучшая из сжатых копий
+            transfer = min(size for size in (raw, gz, br) if size is not None)
+            budget = size_budget(name)
+            total_raw += raw
+            total_transfer += transfer
+
+            line = (
+                f"{name:<48} {raw / 1024:>7.1f}КБ "
+                f"{(f'{gz / 1024:.1f}КБ' if gz else '—'):>9} "
+                f"{(f'{br / 1024:.1f}КБ' if br else '—'):>9} "
+                f"{budget / 1024:>7.0f}КБ"
+            )
+            if transfer > budget:
+                over_budget.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        self.stdout.write(
+            f"Итого: {total_raw / 1024:.0f} КБ на диске, {total_transfer / 1024:.0f} КБ по сети"
+        )
+        if over_budget:
+            raise CommandError(f"Превышен бюджет размера: {', '.join(over_budget)}")
+        self.stdout.write(self.style.SUCCESS('Все файлы укладываются в бюджет'))
@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.management.commands.benchmark_search import COLORS, EXTRAS, FLOWERS, NAME_HEADS, percentile
+from core.suggest import SUGGEST_SOURCES, SuggestIndex, get_index
+
+SAMPLE_PREFIXES = ('бу', 'бук', 'роз', 'кра', 'тюл', 'пио', 'торт', 'ми', 'кор', 'орхидея в', 'букет из 2')
+SKU_UNIT = 10_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает размер индекса подсказок в памяти воркера (в пересчёте на 10 тыс. товаров) '
+        'и время поиска по префиксу. --products N — замер на синтетическом каталоге без БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0, help='Размер синтетического каталога')
+        parser.add_argument('--repeat', type=int, default=200, help='Повторов на каждый префикс')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['products']:
+            index = SuggestIndex(self.synthetic_items(options['products']))
+        else:
+            index = get_index()
+        built = time.perf_counter() - start
+
+        skus = sum(1 for kind, _ in index.items if kind in SUGGEST_SOURCES)
+        footprint = index.footprint()
+        self.stdout.write(f"Товаров и акций: {skus}, всего записей: {len(index.items)}, ключей: {len(index.keys)}")
+        self.stdout.write(f"Сборка: {built * 1000:.0f} мс")
+        self.stdout.write(f"Память: {footprint / 1024 / 1024:.1f} МБ")
+        if skus:
+            self.stdout.write(f"На {SKU_UNIT} товаров: {footprint * SKU_UNIT / skus / 1024 / 1024:.2f} МБ")
+
+        timings = []
+        for prefix in SAMPLE_PREFIXES:
+            for _ in range(options['repeat']):
+                lookup_start = time.perf_counter()
+                index.lookup(prefix)
+                timings.append((time.perf_counter() - lookup_start) * 1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"Поиск по префиксу: p50 {percentile(timings, 0.5):.3f} мс, "
+            f"p95 {percentile(timings, 0.95):.3f} мс, max {max(timings):.3f} мс"
+        ))
+
+    def synthetic_items(self, count):
+        rng = random.Random(42)
+        items = {}
+        for number in range(count):
+            if rng.random() < 0.15:
+                name = rng.choice(EXTRAS)
+            else:
+                name = f"{rng.choice(NAME_HEADS)} {rng.randint(5, 101)} {rng.choice(COLORS)} {rng.choice(FLOWERS)}"
+            items[('product', number)] = ('product', name, (number, f"product-{number}"))
+        return items
@@ -0,0 +1,155 @@
+import os
+import posixpath
+import re
+import time
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.images import (
+    ADMIN_THUMBNAIL_DIR, MANIFEST_CACHE_PREFIX, RENDITION_FORMATS, content_hash, ensure_renditions,
+)
+from core.models import Akchii, NotificationOutbox, Order, Product
+from core.storage import digest_from_name, media_storage
+
+# Поля с загрузками в ContentAddressedStorage
+UPLOAD_FIELDS = (
+    (Product, 'image'),
+    (Akchii, 'image'),
+    (Order, 'check_file'),
+)
+
+RENDITION_RE = re.compile(
+    r'^(?P<stem>.+)\.w\d+\.(?:%s)$' % '|'.join(ext for ext, _, _, _ in RENDITION_FORMATS)
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит старые загрузки в хранилище по хэшу содержимого (--adopt) и удаляет '
+        'файлы, на которые не ссылается ни одна запись: оригиналы, рендишены, миниатюры'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adopt', action='store_true',
+                            help='Переименовать файлы со старыми именами по хэшу; дубликаты схлопнутся в один')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Не трогать файлы моложе этого срока: их запись могла ещё не закоммититься')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if options['adopt']:
+            if dry_run:
+                self.stdout.write('--adopt пропущен в режиме --dry-run')
+            else:
+                self.adopt()
+
+        referenced = self.referenced_names()
+        referenced_stems = {posixpath.splitext(name)[0] for name in referenced}
+        cutoff = time.time() - options['grace_hours'] * 60 * 60
+
+        candidates = []
+        for model, field_name in UPLOAD_FIELDS:
+            upload_to = model._meta.get_field(field_name).upload_to.rstrip('/')
+            for name in self.walk(upload_to):
+                if name in referenced:
+                    continue
+                match = RENDITION_RE.match(name)
+                if match and match.group('stem') in referenced_stems:
+                    continue
+                candidates.append(name)
+
+        # Миниатюры админки лежат по хэшу содержимого оригинала
+        thumb_digests = {
+            content_hash(name, media_storage)
+            for name in Product.objects.exclude(image='').values_list('image', flat=True)
+            if media_storage.exists(name)
+        }
+        for name in self.walk(ADMIN_THUMBNAIL_DIR):
+            if posixpath.basename(name).split('.', 1)[0] not in thumb_digests:
+                candidates.append(name)
+
+        # Рендишены и миниатюра оригинала, который сам ещё в сроке ожидания
+        # (только что загружен или переиспользован), тоже не трогаем
+        fresh_stems = {
+            posixpath.splitext(name)[0] for name in candidates
+            if not RENDITION_RE.match(name) and os.stat(media_storage.path(name)).st_mtime > cutoff
+        }
+        fresh_digests = {digest_from_name(stem) for stem in fresh_stems} - {None}
+
+        removed = freed = 0
+        for name in candidates:
+            match = RENDITION_RE.match(name)
+            if match and match.group('stem') in fresh_stems:
+                continue
+            if name.startswith(f"{ADMIN_THUMBNAIL_DIR}/") and posixpath.basename(name).split('.', 1)[0] in fresh_digests:
+                continue
+            path = media_storage.path(name)
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            removed += 1
+            freed += stat.st_size
+            self.stdout.write(f"{'Будет удалён' if dry_run else 'Удалён'}: {name}")
+            if not dry_run:
+                media_storage.delete(name)
+                cache.delete(f"{MANIFEST_CACHE_PREFIX}:{name}")
+
+        verb = 'Можно удалить' if dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} файлов: {removed}, освобождено {freed / 1024:.0f} КБ"
+        ))
+
+    def walk(self, directory):
+        """Имена файлов в каталоге хранилища, рекурсивно"""
+        root = media_storage.path(directory)
+        for current, _, files in os.walk(root):
+            relative = os.path.relpath(current, media_storage.location).replace(os.sep, '/')
+            for filename in files:
+                yield posixpath.join(relative, filename)
+
+    def referenced_names(self):
+        names = set()
+        for model, field_name in UPLOAD_FIELDS:
+            names.update(model.objects.exclude(**{field_name: ''}).values_list(field_name, flat=True))
+        names.update(NotificationOutbox.objects.exclude(document='').values_list('document', flat=True))
+        return names
+
+    def adopt(self):
+        """
+        Пересохраняет файлы со старыми именами через ContentAddressedStorage.
+        Одинаковые файлы получают одно имя; старые копии становятся сиротами
+        и удаляются ниже в этом же запуске.
+        """
+        adopted = 0
+        for model, field_name in UPLOAD_FIELDS:
+            upload_to = model._meta.get_field(field_name).upload_to
+            legacy = (
+                model.objects.exclude(**{field_name: ''})
+                .order_by().values_list(field_name, flat=True).distinct()
+            )
+            for old_name in list(legacy):
+                if digest_from_name(old_name) or not media_storage.exists(old_name):
+                    continue
+                with media_storage.open(old_name, 'rb') as source:
+                    new_name = media_storage.save(
+                        posixpath.join(upload_to, posixpath.basename(old_name)), File(source)
+                    )
+                changes = {field_name: new_name}
+                if any(field.name == 'updated' for field in model._meta.fields):
+                    # URL картинки на страницах поменялся — двигаем updated для ETag
+                    changes['updated'] = timezone.now()
+                with transaction.atomic():
+                    # update() вместо save(): не пересобираем рендишены по одной записи
+                    model.objects.filter(**{field_name: old_name}).update(**changes)
+                    NotificationOutbox.objects.filter(document=old_name).update(document=new_name)
+                if model is not Order:
+                    # Рендишены пишутся в обычное хранилище по имени оригинала
+                    ensure_renditions(new_name)
+                adopted += 1
+                self.stdout.write(f"{old_name} -> {new_name}")
+        self.stdout.write(f"Перенесено файлов: {adopted}")
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import TelegramUploadStats
+from core.telegram_bot import get_upload_metrics
+
+
+class Command(BaseCommand):
+    help = (
+        'Трафик загрузок документов в Telegram по дням: сколько байт загружено '
+        'и сколько сэкономлено повторными отправками по file_id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='За сколько последних дней показать отчёт')
+
+    def handle(self, *args, **options):
+        since = timezone.localdate() - timedelta(days=options['days'] - 1)
+        self.stdout.write(f"{'день':<12} {'загрузок':>9} {'загружено':>12} {'по file_id':>11} {'сэкономлено':>12}")
+        for stats in TelegramUploadStats.objects.filter(day__gte=since).order_by('day'):
+            self.stdout.write(
+                f"{stats.day.isoformat():<12} {stats.uploads:>9} {self.kb(stats.uploaded_bytes):>12} "
+                f"{stats.reuses:>11} {self.kb(stats.saved_bytes):>12}"
+            )
+        totals = get_upload_metrics(since)
+        self.stdout.write(self.style.SUCCESS(
+            f"{'итого':<12} {totals['uploads']:>9} {self.kb(totals['uploaded_bytes']):>12} "
+            f"{totals['reuses']:>11} {self.kb(totals['saved_bytes']):>12}"
+        ))
+
+    @staticmethod
+    def kb(size):
+        return f"{size / 1024:.1f} КБ"
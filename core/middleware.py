@@ -0,0 +1,135 @@
+import gzip
+import re
+
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .static_assets import accepts_encoding
+
+try:
+    # Необязательная зависимость: без неё отдаётся только gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+# Меньше этого сжимать невыгодно: выигрыш съедают заголовки и время CPU
+COMPRESSION_MIN_SIZE = 1024
+# q5 — обычный компромисс для динамических страниц: выше байты почти не
+# уменьшаются, а время растёт в разы (проверить: benchmark_compression).
+# gzip — уровень 6 из compress_string Django
+BROTLI_QUALITY = 5
+# Случайные байты в заголовке gzip против BREACH, как в GZipMiddleware Django
+GZIP_MAX_RANDOM_BYTES = 100
+
+# Содержимое этих элементов не трогаем: пробелы и переводы строк в них значимы
+PROTECTED_RE = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.S | re.I)
+# Тег целиком, вместе с атрибутами в кавычках: '>' внутри значения (data-x="a > b") тег не закрывает
+TAG_RE = re.compile(r'''(<(?:[^>"']|"[^"]*"|'[^']*')*>)''')
+HTML_COMMENT_RE = re.compile(r'<!--(?!\[if|<!|>).*?-->', re.S)
+WHITESPACE_RE = re.compile(r'\s+')
+CSRF_FIELD_MARKER = b'csrfmiddlewaretoken'
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group(0) else ' '
+
+
+def _minify_text(chunk):
+    chunk = HTML_COMMENT_RE.sub('', chunk)
+    return ''.join(
+        piece if piece.startswith('<') else WHITESPACE_RE.sub(_collapse, piece)
+        for piece in TAG_RE.split(chunk)
+    )
+
+
+def minify_html(html):
+    """
+    Убирает отступы и комментарии из HTML, не меняя того, что видит пользователь.
+
+    Сжимаются только пробелы в тексте между тегами: любая их серия
+    схлопывается в один пробел (или перевод строки) — браузер и так
+    отображает её одним пробелом. Атрибуты тегов, <pre>, <textarea>,
+    <script> и <style> остаются байт в байт.
+    """
+    parts, position = [], 0
+    for match in PROTECTED_RE.finditer(html):
+        parts.append(_minify_text(html[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_minify_text(html[position:]))
+    return ''.join(parts)
+
+
+def compress_body(data, encoding, level=None):
+    """Сжимает тело ответа в br или gzip"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    if level is None:
+        return compress_string(data, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class HtmlMinifyMiddleware:
+    """Минифицирует отрендеренные HTML-страницы (см. minify_html)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith('text/html')
+        ):
+            return response
+
+        html = response.content.decode(response.charset)
+        response.content = minify_html(html).encode(response.charset)
+        if response.has_header('Content-Length'):
+            response.headers['Content-Length'] = str(len(response.content))
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов br/gzip по Accept-Encoding.
+
+    Brotli выбирается, если клиент его принимает и страница не содержит
+    CSRF-токена: у brotli нет аналога случайного заголовка gzip, которым
+    Django закрывает BREACH, поэтому такие страницы уходят в gzip.
+    Ответы короче COMPRESSION_MIN_SIZE и уже сжатые (статика .br/.gz) не трогаются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and accepts_encoding(accept_encoding, 'br') and \
+                CSRF_FIELD_MARKER not in response.content:
+            encoding = 'br'
+        elif accepts_encoding(accept_encoding, 'gzip'):
+            encoding = 'gzip'
+        else:
+            return response
+
+        compressed = compress_body(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        # Сжатое тело уже не совпадает побайтно — ETag становится слабым (RFC 9110)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,186 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:51
+
+import core.models
+import django.core.validators
+import django.db.models.deletion
+import phonenumber_field.modelfields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_telegrammanager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Akchii',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название товара')),
+                ('image', models.ImageField(upload_to='akchii/', verbose_name='Изображение товара')),
+                ('slug', models.SlugField(max_length=100, unique=True, verbose_name='URL-адрес')),
+                ('description', models.TextField(verbose_name='Описание товара')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена (сом)')),
+                ('available', models.BooleanField(default=True, verbose_name='Доступен')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('skidka', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Скидка((новая цена)сом)')),
+            ],
+            options={
+                'verbose_name': 'Акционный Товар',
+                'verbose_name_plural': 'Товары с Акции',
+                'ordering': ['-created'],
+            },
+            bases=(core.models.ProductMixin, models.Model),
+        ),
+        migrations.RemoveField(
+            model_name='cartitem',
+            name='cart',
+        ),
+        migrations.RemoveField(
+            model_name='cartitem',
+            name='product',
+        ),
+        migrations.AlterModelOptions(
+            name='customer',
+            options={'ordering': ['-id'], 'verbose_name': 'Клиент', 'verbose_name_plural': 'Клиенты'},
+        ),
+        migrations.AlterModelOptions(
+            name='order',
+            options={'ordering': ['-created_date'], 'verbose_name': 'Заказ', 'verbose_name_plural': 'Заказы'},
+        ),
+        migrations.RenameField(
+            model_name='order',
+            old_name='comments',
+            new_name='comment',
+        ),
+        migrations.RenameField(
+            model_name='order',
+            old_name='created',
+            new_name='created_date',
+        ),
+        migrations.RenameField(
+            model_name='order',
+            old_name='updated',
+            new_name='updated_date',
+        ),
+        migrations.RemoveField(
+            model_name='customer',
+            name='user',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='email',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='first_name',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='last_name',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='total_price',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='user',
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='full_name',
+            field=models.CharField(default='', max_length=100, verbose_name='Полное имя'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='is_paid',
+            field=models.BooleanField(default=False, verbose_name='Оплачен'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='point',
+            field=models.PositiveIntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Баллы'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='self_pickup',
+            field=models.BooleanField(default=False, verbose_name='Самовывоз'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='spouse_phone',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Телефон супруга/супруги'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='check_file',
+            field=models.FileField(blank=True, upload_to='checks/', verbose_name='Чек (фото/файл)'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_type',
+            field=models.CharField(choices=[('pickup', 'Самовывоз'), ('delivery', 'Доставка')], default='pickup', max_length=20, verbose_name='Тип доставки'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='full_name',
+            field=models.CharField(default='', max_length=50, verbose_name='ФИО'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='skidka',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Скидка((новая цена)сом)'),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='spouse_name',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Имя супруга/супруги (жена или муж)'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='delivery_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Дата доставки'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='delivery_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='Время доставки'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Цена'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.product', verbose_name='Товар'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='product_type',
+            field=models.CharField(choices=[('flower', 'Цветы'), ('toy', 'Игрушки'), ('cake', 'Десерты'), ('flowerbag', 'Цветы в горшке')], max_length=10, verbose_name='Тип товара'),
+        ),
+        migrations.AlterField(
+            model_name='shop',
+            name='phone',
+            field=phonenumber_field.modelfields.PhoneNumberField(max_length=128, region=None, verbose_name='Телефон'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='akchii',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.akchii'),
+        ),
+        migrations.DeleteModel(
+            name='Cart',
+        ),
+        migrations.DeleteModel(
+            name='CartItem',
+        ),
+    ]
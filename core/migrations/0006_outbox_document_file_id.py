@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='document_file_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='file_id документа в Telegram'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:56
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    # Тот же пересчёт, что core.services.recalculate_order_totals, но на
+    # исторических моделях: один UPDATE с подзапросами для всех заказов
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    money = DecimalField(max_digits=10, decimal_places=2)
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    total = items.annotate(total=Sum(F('price') * F('quantity'), output_field=money)).values('total')
+    count = items.annotate(count=Count('id')).values('count')
+    Order.objects.update(
+        total_price=Coalesce(Subquery(total), Value(0), output_field=money),
+        items_count=Coalesce(Subquery(count), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_outbox_document_file_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Позиций'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Сумма заказа'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
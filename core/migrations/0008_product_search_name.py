@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+def fill_search_name(apps, schema_editor):
+    for model_name in ('Product', 'Akchii'):
+        model = apps.get_model('core', model_name)
+        for obj in model.objects.only('id', 'name').iterator():
+            model.objects.filter(pk=obj.pk).update(search_name=obj.name.lower())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='akchii',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100, verbose_name='Название в нижнем регистре (для поиска)'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100, verbose_name='Название в нижнем регистре (для поиска)'),
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:02
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_product_search_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='akchii',
+            name='image',
+            field=models.ImageField(storage=core.storage.ContentAddressedStorage(), upload_to='akchii/', verbose_name='Изображение товара'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='check_file',
+            field=models.FileField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='checks/', verbose_name='Чек (фото/файл)'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(storage=core.storage.ContentAddressedStorage(), upload_to='products/', verbose_name='Изображение товара'),
+        ),
+    ]
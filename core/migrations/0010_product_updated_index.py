@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'updated'], name='product_cat_updated_idx'),
+        ),
+    ]
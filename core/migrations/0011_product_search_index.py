@@ -0,0 +1,38 @@
+from django.db import migrations
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE core_product_search USING fts5("
+    "name, body, tokenize = 'unicode61 remove_diacritics 0', prefix = '2 3')"
+)
+POSTGRES_CREATE = (
+    "CREATE TABLE core_product_search (id bigint PRIMARY KEY, document tsvector NOT NULL)",
+    "CREATE INDEX core_product_search_document_idx ON core_product_search USING GIN (document)",
+)
+
+
+def create_search_index(apps, schema_editor):
+    # Только таблица. В индексе лежат основы слов от стеммера core.search, и в
+    # запросе они выделяются им же, поэтому копия стеммера здесь разошлась бы
+    # с кодом. Пустой индекс заполняет обработчик post_migrate (core.signals)
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == 'postgresql':
+        for sql in POSTGRES_CREATE:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS core_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:24
+
+import re
+
+from django.db import migrations, models
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE core_customer_search USING fts5("
+    "full_name, spouse_name, tokenize = 'trigram')"
+)
+# icontains в PostgreSQL — UPPER("поле"::text) LIKE UPPER(...), индекс строится по тому же выражению
+POSTGRES_CREATE = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX customer_full_name_trgm_idx ON core_customer USING GIN (UPPER(full_name::text) gin_trgm_ops)",
+    "CREATE INDEX customer_spouse_name_trgm_idx ON core_customer USING GIN (UPPER(spouse_name::text) gin_trgm_ops)",
+)
+SQLITE_FILL = (
+    "INSERT INTO core_customer_search (rowid, full_name, spouse_name) "
+    "SELECT id, full_name, spouse_name FROM core_customer"
+)
+
+# Копия core.models.phone_digits на момент миграции: миграция не должна
+# зависеть от того, как эта функция изменится потом
+PHONE_COUNTRY_CODE = '996'
+NATIONAL_PHONE_LENGTH = 9
+NON_DIGITS_RE = re.compile(r'[^0-9]')
+
+
+def phone_digits(value):
+    digits = NON_DIGITS_RE.sub('', value or '')
+    if len(digits) == NATIONAL_PHONE_LENGTH + 1 and digits.startswith('0'):
+        digits = digits[1:]
+    if len(digits) == NATIONAL_PHONE_LENGTH:
+        digits = PHONE_COUNTRY_CODE + digits
+    return digits
+
+
+
+def fill_phone_digits(apps, schema_editor):
+    Customer = apps.get_model('core', 'Customer')
+    for customer in Customer.objects.only('id', 'phone', 'spouse_phone').iterator():
+        digits, spouse_digits = phone_digits(customer.phone), phone_digits(customer.spouse_phone)
+        Customer.objects.filter(pk=customer.pk).update(
+            phone_digits=digits,
+            phone_digits_reversed=digits[::-1],
+            spouse_phone_digits=spouse_digits,
+            spouse_phone_digits_reversed=spouse_digits[::-1],
+        )
+
+
+def create_name_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_FILL)
+    elif vendor == 'postgresql':
+        for sql in POSTGRES_CREATE:
+            schema_editor.execute(sql)
+
+
+def drop_name_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS core_customer_search")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS customer_full_name_trgm_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS customer_spouse_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_product_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_phone_idx',
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(default='', editable=False, max_length=20, verbose_name='Телефон цифрами'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits_reversed',
+            field=models.CharField(default='', editable=False, max_length=20, verbose_name='Телефон цифрами задом наперёд'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='spouse_phone_digits',
+            field=models.CharField(default='', editable=False, max_length=20, verbose_name='Телефон супруга/супруги цифрами'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='spouse_phone_digits_reversed',
+            field=models.CharField(default='', editable=False, max_length=20, verbose_name='Телефон супруга/супруги цифрами задом наперёд'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_digits'], name='customer_phone_digits_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_digits_reversed'], name='customer_phone_rev_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['spouse_phone_digits'], name='customer_spouse_digits_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['spouse_phone_digits_reversed'], name='customer_spouse_rev_idx'),
+        ),
+        migrations.RunPython(fill_phone_digits, migrations.RunPython.noop),
+        migrations.RunPython(create_name_index, drop_name_index),
+    ]
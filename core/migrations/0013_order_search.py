@@ -0,0 +1,80 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:31
+
+import re
+
+from django.db import migrations, models
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE core_order_search USING fts5("
+    "full_name, address, card_message, comment, "
+    "tokenize = 'unicode61 remove_diacritics 0', prefix = '2 3')"
+)
+# Выражение должно совпадать с ORDER_TSVECTOR_SQL в core/crm_search.py
+POSTGRES_CREATE = (
+    "CREATE INDEX order_text_search_idx ON core_order USING GIN ("
+    "to_tsvector('simple', full_name || ' ' || address || ' ' || card_message || ' ' || comment))"
+)
+SQLITE_FILL = (
+    "INSERT INTO core_order_search (rowid, full_name, address, card_message, comment) "
+    "SELECT id, full_name, address, card_message, comment FROM core_order"
+)
+
+# Копия core.models.phone_digits на момент миграции: миграция не должна
+# зависеть от того, как эта функция изменится потом
+PHONE_COUNTRY_CODE = '996'
+NATIONAL_PHONE_LENGTH = 9
+NON_DIGITS_RE = re.compile(r'[^0-9]')
+
+
+def phone_digits(value):
+    digits = NON_DIGITS_RE.sub('', value or '')
+    if len(digits) == NATIONAL_PHONE_LENGTH + 1 and digits.startswith('0'):
+        digits = digits[1:]
+    if len(digits) == NATIONAL_PHONE_LENGTH:
+        digits = PHONE_COUNTRY_CODE + digits
+    return digits
+
+
+
+def fill_phone_digits(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    for order in Order.objects.only('id', 'phone').iterator():
+        Order.objects.filter(pk=order.pk).update(phone_digits=phone_digits(order.phone))
+
+
+def create_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_FILL)
+    elif vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_CREATE)
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS core_order_search")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS order_text_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_customer_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='phone_digits',
+            field=models.CharField(default='', editable=False, max_length=20, verbose_name='Телефон цифрами'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['phone_digits'], name='order_phone_digits_idx'),
+        ),
+        migrations.RunPython(fill_phone_digits, migrations.RunPython.noop),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+def month_day(value):
+    # Копия core.models.month_day на момент миграции: 14 февраля -> 214
+    return value.month * 100 + value.day if value else None
+
+
+def fill_month_days(apps, schema_editor):
+    Customer = apps.get_model('core', 'Customer')
+    customers = Customer.objects.filter(
+        models.Q(birthday__isnull=False) | models.Q(spouse_birthday__isnull=False)
+    ).only('id', 'birthday', 'spouse_birthday')
+    for customer in customers.iterator():
+        Customer.objects.filter(pk=customer.pk).update(
+            birthday_mmdd=month_day(customer.birthday),
+            spouse_birthday_mmdd=month_day(customer.spouse_birthday),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_order_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='birthday_mmdd',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='День рождения (MMDD)'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='spouse_birthday_mmdd',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='День рождения супруга/супруги (MMDD)'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['birthday_mmdd'], name='customer_birthday_mmdd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['spouse_birthday_mmdd'], name='customer_spouse_mmdd_idx'),
+        ),
+        migrations.RunPython(fill_month_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Таблицу DatabaseCache создаёт manage.py createcachetable при развёртывании
+    # (см. CACHES в settings): миграция не должна зависеть от живых настроек.
+    # Пустая миграция остаётся, чтобы не ломать цепочку уже применённых.
+
+    dependencies = [
+        ('core', '0014_customer_birthday_mmdd'),
+    ]
+
+    operations = []
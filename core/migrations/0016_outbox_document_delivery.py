@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:49
+
+import core.storage
+from django.db import migrations, models
+
+
+def fill_documents_delivered(apps, schema_editor):
+    # Раньше чат попадал в delivered, только когда ушли и текст, и документ
+    NotificationOutbox = apps.get_model('core', 'NotificationOutbox')
+    for entry in NotificationOutbox.objects.exclude(document='').iterator():
+        if entry.delivered:
+            entry.documents_delivered = list(entry.delivered)
+            entry.save(update_fields=['documents_delivered'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='documents_delivered',
+            field=models.JSONField(default=list, verbose_name='Документ доставлен в чаты'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='delivered',
+            field=models.JSONField(default=list, verbose_name='Текст доставлен в чаты'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='document',
+            field=models.FileField(blank=True, max_length=255, storage=core.storage.ContentAddressedStorage(), upload_to='checks/', verbose_name='Файл в MEDIA (чек)'),
+        ),
+        migrations.RunPython(fill_documents_delivered, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_outbox_document_delivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramUploadStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('uploads', models.PositiveIntegerField(default=0, verbose_name='Загрузок файла')),
+                ('uploaded_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Загружено байт')),
+                ('reuses', models.PositiveIntegerField(default=0, verbose_name='Отправок по file_id')),
+                ('saved_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Сэкономлено байт')),
+            ],
+            options={
+                'verbose_name': 'Загрузки в Telegram за день',
+                'verbose_name_plural': 'Загрузки в Telegram',
+                'ordering': ['-day'],
+            },
+        ),
+    ]
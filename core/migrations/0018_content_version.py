@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_content_version(apps, schema_editor):
+    # Единственная строка (pk=1); touch_content дальше только обновляет её
+    ContentVersion = apps.get_model('core', 'ContentVersion')
+    ContentVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_telegram_upload_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('changed', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Версия содержимого',
+                'verbose_name_plural': 'Версия содержимого',
+            },
+        ),
+        migrations.RunPython(create_content_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_content_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='akchii',
+            index=models.Index(fields=['updated'], name='akchii_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated'], name='product_updated_idx'),
+        ),
+    ]
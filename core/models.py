@@ -1,10 +1,15 @@
+import re
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 
 from django.forms import ValidationError
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .storage import media_storage
+
 # models.py - добавим в начало файла
 class ProductMixin:
     """Миксин для общих методов товаров"""
@@ -33,6 +38,50 @@ class ProductMixin:
             return self.price - self.final_price
         return 0
 
+
+def final_price_expression():
+    """SQL-аналог ProductMixin.final_price для аннотаций и сортировки в БД"""
+    return models.Case(
+        models.When(skidka__isnull=False, skidka__lt=models.F('price'), then=models.F('skidka')),
+        default=models.F('price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+
+def name_prefix_filter(term):
+    """
+    Поиск по началу названия через индекс search_name.
+
+    LIKE 'abc%' без учёта регистра не использует обычный индекс (а в SQLite
+    ещё и не знает кириллицу), поэтому сравниваем диапазоном по заранее
+    приведённому к нижнему регистру столбцу.
+    """
+    return prefix_filter('search_name', term.strip().lower())
+
+def prefix_filter(field, term):
+    """Поиск по началу значения диапазоном — так SQLite использует обычный индекс"""
+    return models.Q(**{f'{field}__gte': term, f'{field}__lt': term + '\uffff'})
+
+PHONE_COUNTRY_CODE = '996'
+NATIONAL_PHONE_LENGTH = 9
+NON_DIGITS_RE = re.compile(r'[^0-9]')
+
+def phone_digits(value):
+    """
+    Телефон только цифрами и в международном виде: «+996 555 12-34-56»,
+    «0555 123 456» и «555123456» дают одно и то же «996555123456».
+    """
+    digits = NON_DIGITS_RE.sub('', value or '')
+    if len(digits) == NATIONAL_PHONE_LENGTH + 1 and digits.startswith('0'):
+        digits = digits[1:]
+    if len(digits) == NATIONAL_PHONE_LENGTH:
+        digits = PHONE_COUNTRY_CODE + digits
+    return digits
+
+
+def month_day(value):
+    """Дата как число MMDD (14 февраля -> 214) для поиска дней рождения по индексу"""
+    return value.month * 100 + value.day if value else None
+
 # Добавим миксин к моделям
 
     # существующие поля Product...
@@ -105,8 +154,16 @@ class Product(ProductMixin, models.Model):
         verbose_name="Тип товара"
     )
     name = models.CharField(max_length=100, verbose_name="Название товара")
+    search_name = models.CharField(
+        max_length=100,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name="Название в нижнем регистре (для поиска)"
+    )
     image = models.ImageField(
         upload_to='products/', 
+        storage=media_storage,
         verbose_name="Изображение товара"
     )
     slug = models.SlugField(max_length=100, unique=True, verbose_name="URL-адрес")
@@ -160,10 +217,41 @@ class Product(ProductMixin, models.Model):
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ['-created']
+        indexes = [
+            # Каталог: available=True + категория + ценовой фильтр. Условие
+            # вынесено в частичный индекс: Django компилирует available=True
+            # в голое WHERE "available", которое не ищется по индексу.
+            # skidka делает индекс покрывающим для выборки перестановки.
+            models.Index(
+                fields=['category', 'price', 'skidka'],
+                name='product_avail_cat_price_idx',
+                condition=models.Q(available=True),
+            ),
+            # Каталог с сортировкой «сначала новые» (keyset по -created, -id)
+            models.Index(
+                fields=['-created', '-id'],
+                name='product_avail_created_idx',
+                condition=models.Q(available=True),
+            ),
+            # Валидаторы conditional GET: Max(updated) по категории и по всей
+            # таблице берётся из индекса, без чтения строк
+            models.Index(fields=['category', 'updated'], name='product_cat_updated_idx'),
+            models.Index(fields=['updated'], name='product_updated_idx'),
+            # Главная: featured=True ORDER BY -created LIMIT 8
+            models.Index(
+                fields=['-created'],
+                name='product_featured_idx',
+                condition=models.Q(featured=True),
+            ),
+        ]
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        self.search_name = self.name.lower()
+        super().save(*args, **kwargs)
+    
     def get_product_type_display(self):
         return dict(self.PRODUCT_TYPES).get(self.product_type)    
     @property
@@ -215,6 +303,13 @@ class Review(models.Model):
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['-created'],
+                name='review_approved_created_idx',
+                condition=models.Q(approved=True),
+            ),
+        ]
     
     def __str__(self):
         return f"Отзыв на {self.product.name} от {self.name}"
@@ -248,6 +343,102 @@ class TelegramManager(models.Model):
         return f"{self.user.get_full_name()} ({self.chat_id})"
 
 
+class NotificationOutbox(models.Model):
+    """
+    Очередь уведомлений в Telegram.
+
+    Запись создаётся в той же транзакции, что и заказ, а отправляет её
+    фоновый обработчик (core.outbox.drain_outbox) с повторами.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENDING, 'Отправляется'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_DEAD, 'Не доставлено'),
+    ]
+
+    order = models.ForeignKey(
+        'Order',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='notifications',
+        verbose_name="Заказ"
+    )
+    message = models.TextField(verbose_name="Текст сообщения")
+    # Тот же файл, что Order.check_file, и в том же хранилище
+    document = models.FileField(
+        upload_to='checks/', storage=media_storage, max_length=255, blank=True, verbose_name="Файл в MEDIA (чек)"
+    )
+    document_file_id = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="file_id документа в Telegram"
+    )
+    recipients = models.JSONField(default=list, verbose_name="Chat ID получателей")
+    # Текст и документ учитываются отдельно: повтор после сбоя загрузки
+    # чека не шлёт текст заказа второй раз
+    delivered = models.JSONField(default=list, verbose_name="Текст доставлен в чаты")
+    documents_delivered = models.JSONField(default=list, verbose_name="Документ доставлен в чаты")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Статус"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Уведомление в очереди"
+        verbose_name_plural = "Очередь уведомлений"
+        ordering = ['-created']
+        indexes = [
+            # Выборка обработчика: status='pending' AND next_attempt_at <= now
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"Уведомление #{self.id} ({self.get_status_display()})"
+
+    @property
+    def pending_recipients(self):
+        """Чаты, куда ещё не доставлен текст или документ"""
+        return [
+            chat_id for chat_id in self.recipients
+            if chat_id not in self.delivered or (self.document and chat_id not in self.documents_delivered)
+        ]
+
+
+class TelegramUploadStats(models.Model):
+    """
+    Трафик загрузок документов в Telegram по дням.
+
+    Счётчики увеличиваются через F() одним UPDATE (core.telegram_bot.record_upload_metrics),
+    поэтому воркеры и обработчик очереди не теряют значения друг друга.
+    """
+    day = models.DateField(unique=True, verbose_name="День")
+    uploads = models.PositiveIntegerField(default=0, verbose_name="Загрузок файла")
+    uploaded_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Загружено байт")
+    reuses = models.PositiveIntegerField(default=0, verbose_name="Отправок по file_id")
+    saved_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Сэкономлено байт")
+
+    class Meta:
+        verbose_name = "Загрузки в Telegram за день"
+        verbose_name_plural = "Загрузки в Telegram"
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"Загрузки в Telegram за {self.day}"
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('new', 'Новый'),
@@ -266,6 +457,8 @@ class Order(models.Model):
     # user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
     full_name = models.CharField(max_length=50, verbose_name="ФИО")
     phone = models.CharField(max_length=20, verbose_name="Телефон")
+    # Телефон цифрами (phone_digits) для точного поиска заказов в админке
+    phone_digits = models.CharField(max_length=20, default='', editable=False, verbose_name="Телефон цифрами")
     address = models.CharField(max_length=250, blank=True, verbose_name="Адрес доставки")
     shop = models.ForeignKey(
         Shop, 
@@ -289,7 +482,7 @@ class Order(models.Model):
     comment = models.TextField(blank=True, verbose_name="Комментарии к заказу")
     created_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_date = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
-    check_file = models.FileField(upload_to='checks/', blank=True, verbose_name="Чек (фото/файл)")
+    check_file = models.FileField(upload_to='checks/', storage=media_storage, blank=True, verbose_name="Чек (фото/файл)")
     status = models.CharField(
         max_length=20, 
         choices=STATUS_CHOICES, 
@@ -302,19 +495,38 @@ class Order(models.Model):
         default='cash',
         verbose_name="Способ оплаты"
     )
+    # Денормализованные итоги заказа, поддерживаются при записи позиций
+    # (core.services.recalculate_order_totals)
+    total_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Сумма заказа"
+    )
+    items_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Позиций"
+    )
     
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ['-created_date']
+        indexes = [
+            # Админка: фильтр по статусу + date_hierarchy/сортировка по дате
+            models.Index(fields=['status', '-created_date'], name='order_status_created_idx'),
+            models.Index(fields=['phone_digits'], name='order_phone_digits_idx'),
+        ]
 
-    @property
-    def total_price(self):
-        return sum(item.get_cost() for item in self.items.all())
-    
     def __str__(self):
         return f"Заказ №{self.id} от {self.full_name}"
 
+    def save(self, *args, **kwargs):
+        self.phone_digits = phone_digits(self.phone)
+        super().save(*args, **kwargs)
+
 
 
 
@@ -340,6 +552,25 @@ class Customer(models.Model):
         verbose_name="Дата рождения супруга/супруги"
     )
     spouse_phone = models.CharField(max_length=20, verbose_name="Телефон супруга/супруги", blank=True)
+    # Месяц и день рождения числом MMDD (см. month_day): по ним ищет core.birthdays
+    birthday_mmdd = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name="День рождения (MMDD)"
+    )
+    spouse_birthday_mmdd = models.PositiveSmallIntegerField(
+        null=True, editable=False, verbose_name="День рождения супруга/супруги (MMDD)"
+    )
+    # Нормализованные телефоны для поиска в CRM (см. phone_digits): по началу
+    # номера и, через перевёрнутую строку, по последним цифрам
+    phone_digits = models.CharField(max_length=20, default='', editable=False, verbose_name="Телефон цифрами")
+    phone_digits_reversed = models.CharField(
+        max_length=20, default='', editable=False, verbose_name="Телефон цифрами задом наперёд"
+    )
+    spouse_phone_digits = models.CharField(
+        max_length=20, default='', editable=False, verbose_name="Телефон супруга/супруги цифрами"
+    )
+    spouse_phone_digits_reversed = models.CharField(
+        max_length=20, default='', editable=False, verbose_name="Телефон супруга/супруги цифрами задом наперёд"
+    )
     favorite_flowers = models.CharField(
         max_length=200, 
         blank=True,
@@ -358,10 +589,31 @@ class Customer(models.Model):
         verbose_name = "Клиент"
         verbose_name_plural = "Клиенты"
         ordering = ['-id']
+        indexes = [
+            # Поиск в CRM: телефоны по началу и по окончанию номера, имя по началу
+            # (подстроки имени ищутся через core.crm_search)
+            models.Index(fields=['phone_digits'], name='customer_phone_digits_idx'),
+            models.Index(fields=['phone_digits_reversed'], name='customer_phone_rev_idx'),
+            models.Index(fields=['spouse_phone_digits'], name='customer_spouse_digits_idx'),
+            models.Index(fields=['spouse_phone_digits_reversed'], name='customer_spouse_rev_idx'),
+            models.Index(fields=['full_name'], name='customer_full_name_idx'),
+            # Ежедневный отчёт о днях рождения
+            models.Index(fields=['birthday_mmdd'], name='customer_birthday_mmdd_idx'),
+            models.Index(fields=['spouse_birthday_mmdd'], name='customer_spouse_mmdd_idx'),
+        ]
     
     def __str__(self):
         return f"Клиент {self.full_name}"
 
+    def save(self, *args, **kwargs):
+        self.phone_digits = phone_digits(self.phone)
+        self.phone_digits_reversed = self.phone_digits[::-1]
+        self.spouse_phone_digits = phone_digits(self.spouse_phone)
+        self.spouse_phone_digits_reversed = self.spouse_phone_digits[::-1]
+        self.birthday_mmdd = month_day(self.birthday)
+        self.spouse_birthday_mmdd = month_day(self.spouse_birthday)
+        super().save(*args, **kwargs)
+
 
 
 
@@ -377,8 +629,16 @@ class Akchii(ProductMixin,models.Model):
     
     
     name = models.CharField(max_length=100, verbose_name="Название товара")
+    search_name = models.CharField(
+        max_length=100,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name="Название в нижнем регистре (для поиска)"
+    )
     image = models.ImageField(
         upload_to='akchii/', 
+        storage=media_storage,
         verbose_name="Изображение товара"
     )
     slug = models.SlugField(max_length=100, unique=True, verbose_name="URL-адрес")
@@ -400,10 +660,24 @@ class Akchii(ProductMixin,models.Model):
         verbose_name = "Акционный Товар"
         verbose_name_plural = "Товары с Акции"
         ordering = ['-created']
+        indexes = [
+            # Страница акций: available=True, skidka IS NOT NULL ORDER BY -created, -id
+            models.Index(
+                fields=['-created', '-id'],
+                name='akchii_active_created_idx',
+                condition=models.Q(available=True, skidka__isnull=False),
+            ),
+            # Валидаторы conditional GET и индекс подсказок: Max(updated) по индексу
+            models.Index(fields=['updated'], name='akchii_updated_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        self.search_name = self.name.lower()
+        super().save(*args, **kwargs)
+    
     def get_product_type_display(self):
         return dict(self.PRODUCT_TYPES).get(self.product_type)    
     @property
@@ -487,5 +761,23 @@ class OrderItem(models.Model):
         """Проверяет, является ли товар акционным"""
         return self.akchii is not None
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} (заказ №{self.order.id})"
+        return f"{self.quantity} x {self.product_name} (заказ №{self.order_id})"
+
+
+
+class ContentVersion(models.Model):
+    """
+    Одна строка (pk=1): когда в последний раз менялись данные без своего поля
+    updated — категории, магазины, отзывы, удаления товаров и акций.
 
+    Отметка пишется в той же транзакции, что и изменение (core.conditional.touch_content),
+    поэтому все воркеры видят её вместе с самими данными, а сброс кэша её не теряет.
+    """
+    changed = models.DateTimeField(default=timezone.now, verbose_name="Изменено")
+
+    class Meta:
+        verbose_name = "Версия содержимого"
+        verbose_name_plural = "Версия содержимого"
+
+    def __str__(self):
+        return f"Содержимое изменено {self.changed}"
@@ -0,0 +1,145 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NotificationOutbox, TelegramManager
+from .telegram_bot import fan_out
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+# Запись в статусе «отправляется» дольше этого срока считается брошенной
+# упавшим обработчиком и забирается снова
+STALE_SENDING_SECONDS = 10 * 60
+
+_drain_lock = threading.Lock()
+
+
+def enqueue_notification(message, document='', order=None):
+    """
+    Ставит уведомление всем активным менеджерам в очередь.
+
+    Вызывается внутри транзакции заказа: если заказ откатится, уведомление
+    тоже исчезнет. После коммита запускается фоновая отправка, так что
+    ответ покупателю не ждёт Telegram.
+    """
+    recipients = list(
+        TelegramManager.objects.filter(is_active=True, notify_orders=True)
+        .values_list('chat_id', flat=True)
+    )
+    if not recipients:
+        return None
+
+    entry = NotificationOutbox.objects.create(
+        order=order,
+        message=message,
+        document=document,
+        recipients=recipients,
+    )
+    if getattr(settings, 'OUTBOX_KICK_ON_COMMIT', True):
+        transaction.on_commit(kick_outbox_worker)
+    return entry
+
+
+def backoff_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой"""
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_due(limit=50):
+    """
+    Забирает готовые к отправке записи, переводя их в статус «отправляется».
+
+    Захват — условный UPDATE по одной записи, поэтому два обработчика не
+    отправят одно уведомление дважды даже на SQLite без SELECT ... FOR UPDATE.
+    """
+    now = timezone.now()
+    due = (
+        Q(status=NotificationOutbox.STATUS_PENDING, next_attempt_at__lte=now) |
+        Q(status=NotificationOutbox.STATUS_SENDING, updated__lt=now - timedelta(seconds=STALE_SENDING_SECONDS))
+    )
+    candidates = list(
+        NotificationOutbox.objects.filter(due)
+        .order_by('next_attempt_at')
+        .values_list('id', 'status')[:limit]
+    )
+
+    claimed = []
+    for entry_id, status in candidates:
+        updated = NotificationOutbox.objects.filter(id=entry_id, status=status).filter(due).update(
+            status=NotificationOutbox.STATUS_SENDING,
+            updated=now,
+        )
+        if updated:
+            claimed.append(entry_id)
+    return list(NotificationOutbox.objects.filter(id__in=claimed))
+
+
+def deliver(entry):
+    """
+    Отправляет запись в оставшиеся чаты и выставляет итоговый статус.
+    Текст и документ отмечаются доставленными по отдельности, и повторная
+    попытка досылает только то, что не прошло.
+    """
+    errors = []
+    results = fan_out(
+        entry.pending_recipients,
+        entry.message,
+        entry.document or None,
+        entry.document_file_id,
+        message_done=entry.delivered,
+        document_done=entry.documents_delivered,
+    )
+    for chat_id, result in results.items():
+        if result.message_sent:
+            entry.delivered.append(chat_id)
+        if result.ok and entry.document:
+            entry.documents_delivered.append(chat_id)
+        if not result.ok:
+            errors.append(f"{chat_id}: {result.error}")
+        # Повторные попытки берут уже загруженный файл по file_id
+        entry.document_file_id = entry.document_file_id or result.file_id
+
+    entry.attempts += 1
+    entry.last_error = '\n'.join(errors)
+    if not errors:
+        entry.status = NotificationOutbox.STATUS_SENT
+    elif entry.attempts >= MAX_ATTEMPTS:
+        entry.status = NotificationOutbox.STATUS_DEAD
+    else:
+        entry.status = NotificationOutbox.STATUS_PENDING
+        entry.next_attempt_at = timezone.now() + backoff_delay(entry.attempts)
+    entry.save(update_fields=['delivered', 'documents_delivered', 'document_file_id', 'attempts', 'last_error', 'status', 'next_attempt_at', 'updated'])
+    return entry
+
+
+def drain_outbox(limit=50):
+    """Обрабатывает все записи, срок которых подошёл. Возвращает их количество"""
+    processed = 0
+    while True:
+        batch = claim_due(limit)
+        if not batch:
+            return processed
+        for entry in batch:
+            deliver(entry)
+        processed += len(batch)
+
+
+def _drain_in_background():
+    try:
+        drain_outbox()
+    finally:
+        # У потока своё соединение с БД — закрываем его сами
+        connections.close_all()
+        _drain_lock.release()
+
+
+def kick_outbox_worker():
+    """Запускает разбор очереди в фоновом потоке, если он ещё не идёт"""
+    if not _drain_lock.acquire(blocking=False):
+        return
+    threading.Thread(target=_drain_in_background, daemon=True).start()
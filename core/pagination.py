@@ -0,0 +1,160 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+ESTIMATE_CACHE_TIMEOUT = 5 * 60
+
+
+def encode_cursor(values, direction):
+    """Упаковывает значения ключа сортировки в непрозрачный токен"""
+    payload = json.dumps({'v': [str(value) for value in values], 'd': direction})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для битого или пустого токена возвращает (None, None)"""
+    if not token:
+        return None, None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values, direction = payload['v'], payload['d']
+    except (ValueError, KeyError, TypeError):
+        return None, None
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None, None
+    return values, direction
+
+
+def estimate_count(queryset):
+    """
+    Примерное количество строк для надписи «найдено N товаров».
+
+    COUNT(*) выполняется не чаще раза в ESTIMATE_CACHE_TIMEOUT на каждый
+    уникальный запрос, поэтому переходы по страницам его не повторяют.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f"{sql}:{params}".encode('utf-8')).hexdigest()
+    key = f"keyset_estimate:{digest}"
+    total = cache.get(key)
+    if total is None:
+        total = queryset.order_by().count()
+        cache.set(key, total, ESTIMATE_CACHE_TIMEOUT)
+    return total
+
+
+class CursorPage:
+    """Страница keyset-пагинации; в шаблонах используется вместо Page"""
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None, estimated_total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.estimated_total = estimated_total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Пагинация по курсору вместо OFFSET.
+
+    ordering — кортеж полей в стиле order_by ('-created', '-id'); последнее
+    поле должно быть уникальным, чтобы порядок был строгим. Страница
+    выбирается условием WHERE по ключу последней показанной строки, поэтому
+    глубокие страницы стоят столько же, сколько первая, а COUNT(*) не нужен.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _field(self, name):
+        """Поле модели или аннотации queryset (например, sort_price)"""
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _parse(self, values):
+        """
+        Значения курсора в типах полей сортировки. Курсор приходит из URL:
+        подделанный или устаревший (None) даёт первую страницу, а не 500.
+        """
+        if values is None or len(values) != len(self.fields):
+            return None
+        try:
+            values = [self._field(name).to_python(value) for (name, _), value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+        return None if None in values else values
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name, _ in self.fields]
+
+    def _seek(self, values, forward):
+        """Условие «строго после (или до) ключа values» для составного ключа"""
+        condition = Q()
+        for position, (name, descending) in enumerate(self.fields):
+            # Вперёд по убыванию — это «меньше», вперёд по возрастанию — «больше»
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f"{name}__{lookup}": values[position]})
+            for prev_position, (prev_name, _) in enumerate(self.fields[:position]):
+                step &= Q(**{prev_name: values[prev_position]})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f"-{name}" for name in self.ordering]
+
+    def get_page(self, cursor=None, with_estimate=False):
+        values, direction = decode_cursor(cursor)
+        values = self._parse(values)
+        if values is None:
+            direction = None
+
+        if direction == 'prev':
+            queryset = self.queryset.filter(self._seek(values, forward=False))
+            rows = list(queryset.order_by(*self._reversed_ordering())[:self.per_page + 1])
+            has_more_before = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_more_after = True
+        else:
+            queryset = self.queryset
+            if values is not None:
+                queryset = queryset.filter(self._seek(values, forward=True))
+            rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_more_after = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_more_before = values is not None
+
+        next_cursor = prev_cursor = None
+        if rows and has_more_after:
+            next_cursor = encode_cursor(self._key(rows[-1]), 'next')
+        if rows and has_more_before:
+            prev_cursor = encode_cursor(self._key(rows[0]), 'prev')
+
+        estimated_total = estimate_count(self.queryset) if with_estimate else None
+        return CursorPage(rows, next_cursor, prev_cursor, estimated_total)
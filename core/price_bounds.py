@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db.models import Max, Min
+
+from .models import Product, final_price_expression
+
+PRICE_BOUNDS_VERSION_KEY = 'price_bounds:version'
+PRICE_BOUNDS_TIMEOUT = 24 * 60 * 60
+
+DEFAULT_MIN_PRICE = 0
+DEFAULT_MAX_PRICE = 10000
+
+
+def price_bounds_version():
+    """Текущее поколение кэша границ цен"""
+    return cache.get_or_set(PRICE_BOUNDS_VERSION_KEY, 1, None)
+
+
+def invalidate_price_bounds():
+    """
+    Сбрасывает все закэшированные границы цен разом.
+
+    Вместо поиска затронутых ключей увеличивается номер поколения: товар мог
+    сменить категорию, и тогда устарели границы и старой, и новой категории.
+    Номер лежит в общем кэше (settings.CACHES), поэтому сброс виден всем воркерам.
+    """
+    try:
+        cache.incr(PRICE_BOUNDS_VERSION_KEY)
+    except ValueError:
+        cache.set(PRICE_BOUNDS_VERSION_KEY, 1, None)
+
+
+def _compute_price_bounds(main_category, category):
+    products = Product.objects.filter(available=True)
+    if category is not None:
+        products = products.filter(category=category)
+    elif main_category is not None:
+        products = products.filter(category__main_category=main_category)
+
+    prices = products.aggregate(
+        min_price=Min('price'),
+        max_price=Max('price'),
+        final_min_price=Min(final_price_expression()),
+        final_max_price=Max(final_price_expression()),
+    )
+    return {
+        'min': int(prices['min_price']) if prices['min_price'] else DEFAULT_MIN_PRICE,
+        'max': int(prices['max_price']) if prices['max_price'] else DEFAULT_MAX_PRICE,
+        'final_min': int(prices['final_min_price']) if prices['final_min_price'] else DEFAULT_MIN_PRICE,
+        'final_max': int(prices['final_max_price']) if prices['final_max_price'] else DEFAULT_MAX_PRICE,
+    }
+
+
+def get_price_bounds(main_category=None, category=None):
+    """
+    Границы цен доступных товаров для ползунка фильтра.
+
+    Возвращает min/max по полю price и final_min/final_max по итоговой цене
+    со скидкой. Значения берутся из кэша и пересчитываются только после
+    изменения товаров (см. core.signals).
+    """
+    key = 'price_bounds:{}:{}:{}'.format(
+        price_bounds_version(),
+        main_category.pk if main_category is not None else '-',
+        category.pk if category is not None else '-',
+    )
+    bounds = cache.get(key)
+    if bounds is None:
+        bounds = _compute_price_bounds(main_category, category)
+        cache.set(key, bounds, PRICE_BOUNDS_TIMEOUT)
+    return bounds
@@ -0,0 +1,366 @@
+import re
+from functools import lru_cache
+
+from django.db import connection
+
+from .models import Akchii, Product, name_prefix_filter
+
+# Таблица полнотекстового индекса (создаётся миграцией 0011 под СУБД)
+SEARCH_TABLE = 'core_product_search'
+SEARCH_RESULTS_LIMIT = 48
+# Вес совпадения в названии относительно описания/состава при ранжировании
+NAME_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+# Ранжируются только столько самых новых совпадений: у слов вроде «букет»
+# совпадает почти весь каталог, а BM25 по 100 тыс. строк — это сотни мс
+SEARCH_CANDIDATE_LIMIT = 2000
+
+# Товары и акции лежат в одном индексе, чтобы ранжироваться вместе:
+# rowid = pk * 2 + код типа, так удаление и обновление идут по первичному ключу
+SEARCH_KINDS = {
+    'product': (Product, 0),
+    'akchii': (Akchii, 1),
+}
+
+WORD_RE = re.compile(r'\w+')
+# Короткие слова не стеммим: от «мак» или «чай» ничего не останется
+MIN_STEM_LENGTH = 4
+MAX_QUERY_TERMS = 8
+
+# Russian Snowball (snowballstem.org/algorithms/russian), окончания от длинных к коротким.
+# Своя реализация: стеммер нужен одинаковый при индексации и в запросе, в любой СУБД
+RU_VOWELS = 'аеиоуыэюя'
+RU_PERFECTIVE_GERUND = (('вшись', 'вши', 'в'), ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'))
+RU_REFLEXIVE = ('ся', 'сь')
+RU_ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий', 'ый', 'ой',
+    'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+RU_PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+# Однобуквенные глагольные -й, -л, -н не снимаем: «тюльпан» не должен стать «тюльпа»
+RU_VERB = (
+    ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет', 'ют', 'ны', 'ть'),
+    (
+        'ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло', 'ено', 'ует', 'уют',
+        'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю',
+    ),
+)
+RU_NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье', 'еи', 'ии', 'ей', 'ой',
+    'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у',
+    'ы', 'ь', 'ю', 'я',
+)
+RU_SUPERLATIVE = ('ейше', 'ейш')
+RU_DERIVATIONAL = ('ость', 'ост')
+
+# Кыргызские буквы, которых нет в русском алфавите: по ним выбирается стеммер
+KY_LETTERS = frozenset('ңөү')
+# Падежные окончания (сначала трёхбуквенные) и множественное число, снимаются в этом порядке
+KY_CASE_ENDINGS = (
+    tuple(f"{first}{vowel}н" for first in 'дтн' for vowel in 'ыиуүаеоө')  # родительный, исходный
+    + tuple(f"{first}{vowel}" for first in 'дтн' for vowel in 'ыиуү')  # винительный
+    + tuple(f"{first}{vowel}" for first in 'дтгк' for vowel in 'аеоө')  # местный, дательный
+)
+KY_PLURAL_ENDINGS = tuple(f"{first}{vowel}р" for first in 'лдт' for vowel in 'аеоө')
+
+
+def _regions(word):
+    """RV, R1, R2 алгоритма Snowball — индексы начала областей"""
+    rv = next((i + 1 for i, char in enumerate(word) if char in RU_VOWELS), len(word))
+
+    def after_vowel_consonant(start):
+        for i in range(start + 1, len(word)):
+            if word[i] not in RU_VOWELS and word[i - 1] in RU_VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = after_vowel_consonant(0)
+    return rv, r1, after_vowel_consonant(r1)
+
+
+def _strip(word, start, endings, after_a=False):
+    """Снимает первое подходящее окончание в области start; after_a — только после «а»/«я»"""
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            stem = word[:-len(ending)]
+            if after_a and not (stem.endswith(('а', 'я')) and len(stem) - 1 >= start):
+                continue
+            return stem
+    return None
+
+
+def _strip_groups(word, start, groups):
+    """Группа 1 окончаний требует «а»/«я» перед собой, группа 2 — нет"""
+    first, second = groups
+    found = _strip(word, start, second)
+    if found is None:
+        found = _strip(word, start, first, after_a=True)
+    return found
+
+
+def stem_ru(word):
+    rv, _, r2 = _regions(word)
+
+    stem = _strip_groups(word, rv, RU_PERFECTIVE_GERUND)
+    if stem is None:
+        word = _strip(word, rv, RU_REFLEXIVE) or word
+        stem = _strip(word, rv, RU_ADJECTIVE)
+        if stem is not None:
+            stem = _strip_groups(stem, rv, RU_PARTICIPLE) or stem
+        else:
+            # В Snowball глагольные окончания проверяются раньше именных, но в
+            # каталоге почти одни существительные: «тюльпаны» должно дать
+            # «тюльпан», как и «тюльпанов», а не «тюльпа» (глагольное -ны)
+            stem = _strip(word, rv, RU_NOUN) or _strip_groups(word, rv, RU_VERB)
+    word = stem if stem is not None else word
+
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, r2, RU_DERIVATIONAL) or word
+
+    if word.endswith('нн'):
+        return word[:-1]
+    superlative = _strip(word, rv, RU_SUPERLATIVE)
+    if superlative is not None:
+        return superlative[:-1] if superlative.endswith('нн') else superlative
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+def stem_ky(word):
+    """
+    Лёгкий стеммер для кыргызского: снимает падежное окончание и аффикс
+    множественного числа (гүлдөрдүн -> гүл). Основа не короче трёх букв.
+    """
+    for endings in (KY_CASE_ENDINGS, KY_PLURAL_ENDINGS):
+        for ending in endings:
+            if word.endswith(ending) and len(word) - len(ending) >= 3:
+                word = word[:-len(ending)]
+                break
+    return word
+
+
+# Словарь каталога невелик, а одни и те же слова повторяются в тысячах описаний
+@lru_cache(maxsize=50_000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if len(word) < MIN_STEM_LENGTH or not word.isalpha():
+        return word
+    if KY_LETTERS.intersection(word):
+        return stem_ky(word)
+    return stem_ru(word)
+
+
+def normalize(text):
+    """Текст как последовательность основ — так он и лежит в индексе"""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text or ''))
+
+
+def query_terms(query):
+    return [stem(word) for word in WORD_RE.findall(query or '')][:MAX_QUERY_TERMS]
+
+
+def document_fields(obj):
+    """(название, остальной текст) товара или акции — уже в виде основ"""
+    body = ' '.join(
+        getattr(obj, field, '') or ''
+        for field in ('description', 'flowers_included', 'ingredients', 'material')
+    )
+    return normalize(obj.name), normalize(body)
+
+
+def search_rowid(kind, pk):
+    return pk * 2 + SEARCH_KINDS[kind][1]
+
+
+def kind_of(obj):
+    return 'akchii' if obj._meta.model_name == 'akchii' else 'product'
+
+
+def should_index(obj):
+    """В поиск попадают только товары, которые видны покупателю"""
+    return obj.available
+
+
+class SqliteFtsBackend:
+    """
+    SQLite FTS5: столбцы name и body с заранее выделенными основами,
+    ранжирование — встроенная bm25() с весом названия NAME_WEIGHT.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index(self, rows):
+        """rows: [(rowid, name, body)]"""
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(f"INSERT INTO {SEARCH_TABLE} (rowid, name, body) VALUES (%s, %s, %s)", rows)
+
+    def delete(self, rowids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(rowid,) for rowid in rowids])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    def search(self, terms, limit):
+        # Каждое слово в кавычках — синтаксис FTS5 из запроса не проходит;
+        # звёздочка ищет по префиксу основы, как при наборе запроса
+        match = ' '.join('"{}"*'.format(term.replace('"', '')) for term in terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM ("
+                f"SELECT rowid, bm25({SEARCH_TABLE}, {NAME_WEIGHT}, {BODY_WEIGHT}) AS score "
+                f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s"
+                f") ORDER BY score LIMIT %s",
+                [match, SEARCH_CANDIDATE_LIMIT, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresFtsBackend:
+    """
+    PostgreSQL: tsvector с GIN-индексом. Основы выделяются тем же стеммером,
+    поэтому словарь 'simple'; название — вес A, остальное — D. BM25 в
+    Postgres нет, ранжирование — ts_rank_cd.
+    """
+
+    RANK_WEIGHTS = '{%s, 0, 0, %s}' % (BODY_WEIGHT / NAME_WEIGHT, 1.0)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (id, document) VALUES "
+                "(%s, setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'D')) "
+                "ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def delete(self, rowids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE id = ANY(%s)", [list(rowids)])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+    def search(self, terms, limit):
+        # В terms только буквы и цифры (WORD_RE), так что to_tsquery их не спутает с операторами
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM ("
+                f"SELECT id, ts_rank_cd(%s, document, query) AS score FROM {SEARCH_TABLE}, to_tsquery('simple', %s) query "
+                "WHERE document @@ query ORDER BY id DESC LIMIT %s"
+                ") candidates ORDER BY score DESC LIMIT %s",
+                [self.RANK_WEIGHTS, tsquery, SEARCH_CANDIDATE_LIMIT, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SqliteFtsBackend,
+    'postgresql': PostgresFtsBackend,
+}
+
+
+def get_backend(using=None):
+    """Бэкенд полнотекстового поиска для СУБД или None, если она не поддерживается"""
+    conn = using or connection
+    backend_class = SEARCH_BACKENDS.get(conn.vendor)
+    return backend_class(conn) if backend_class else None
+
+
+def index_objects(objects, kind=None, backend=None):
+    """Добавляет или обновляет товары в индексе; скрытые — удаляет из него"""
+    backend = backend or get_backend()
+    if backend is None:
+        return
+    rows, removed = [], []
+    for obj in objects:
+        rowid = search_rowid(kind or kind_of(obj), obj.pk)
+        if should_index(obj):
+            rows.append((rowid, *document_fields(obj)))
+        else:
+            removed.append(rowid)
+    if removed:
+        backend.delete(removed)
+    if rows:
+        backend.index(rows)
+
+
+def unindex_object(obj):
+    backend = get_backend()
+    if backend is not None:
+        backend.delete([search_rowid(kind_of(obj), obj.pk)])
+
+
+def rebuild_index(models=None, batch_size=1000, backend=None):
+    """
+    Перестраивает индекс целиком. Нужен после массового update() товаров,
+    который обходит сигналы. Возвращает число проиндексированных записей.
+    """
+    backend = backend or get_backend()
+    if backend is None:
+        return 0
+    backend.clear()
+    total = 0
+    for kind, (model, _) in SEARCH_KINDS.items():
+        model = (models or {}).get(kind, model)
+        batch = []
+        for obj in model.objects.filter(available=True).order_by().iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                index_objects(batch, kind, backend)
+                total += len(batch)
+                batch = []
+        index_objects(batch, kind, backend)
+        total += len(batch)
+    return total
+
+
+def fill_empty_index(models=None, using=None):
+    """
+    Строит индекс, если таблица есть, но в ней пусто: сразу после миграции
+    0011 или восстановления БД без индекса. Вызывается после migrate
+    (core.signals); models — модели из состояния миграций. Возвращает число записей.
+    """
+    conn = using or connection
+    backend = get_backend(conn)
+    if backend is None or SEARCH_TABLE not in conn.introspection.table_names():
+        return 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {SEARCH_TABLE} LIMIT 1")
+        if cursor.fetchone():
+            return 0
+    return rebuild_index(models, backend=backend)
+
+
+def search_products(query, limit=SEARCH_RESULTS_LIMIT):
+    """
+    Товары и акции по запросу в порядке релевантности.
+
+    Без поддерживаемой СУБД — поиск по началу названия товара (name_prefix_filter).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    backend = get_backend()
+    if backend is None:
+        return list(Product.objects.filter(name_prefix_filter(query), available=True)[:limit])
+
+    rowids = backend.search(terms, limit)
+    ids = {kind: [rowid // 2 for rowid in rowids if rowid % 2 == code] for kind, (_, code) in SEARCH_KINDS.items()}
+    found = {}
+    for kind, (model, _) in SEARCH_KINDS.items():
+        if ids[kind]:
+            for obj in model.objects.filter(pk__in=ids[kind], available=True):
+                obj.search_kind = kind
+                found[search_rowid(kind, obj.pk)] = obj
+    return [found[rowid] for rowid in rowids if rowid in found]
@@ -0,0 +1,117 @@
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderItem
+from .outbox import enqueue_notification
+
+
+def build_order_details(order, cart_items, total_price):
+    """Снимок заказа для уведомлений — без повторных запросов к order.items"""
+    return {
+        'id': order.id,
+        'name': order.full_name,
+        'phone': order.phone,
+        'address': order.address,
+        'delivery_type': order.delivery_type,
+        'payment_method': order.get_payment_method_display(),
+        'comment': order.comment,
+        'has_receipt': bool(order.check_file),
+        'items': [{
+            'name': f"{item['product'].name} {'(АКЦИЯ)' if item['model_type'] == 'akchii' else ''}",
+            'quantity': item['quantity'],
+            'price': item['unit_price'],
+            'total': item['item_total']
+        } for item in cart_items],
+        'total_price': total_price,
+    }
+
+
+def format_telegram_message(order_details):
+    """Format order details for Telegram notification with HTML formatting"""
+    
+    items_text = "\n".join(
+        f"• {item['name']} - {item['quantity']} × {item['price']} сом = {item['total']} сом"
+        for item in order_details['items']
+    )
+    
+    delivery_info = "🚚 Доставка" if order_details['delivery_type'] == 'delivery' else "🏪 Самовывоз"
+    if order_details.get('address'):
+        delivery_info += f"\n📍 Адрес: {order_details['address']}"
+    
+    payment_method = order_details.get('payment_method', 'не указан')
+    receipt_info = "\n🧾 Чек об оплате приложен" if order_details.get('has_receipt') else "\n⏳ Чек не предоставлен"
+    
+    return f"""
+<b>🛒 НОВЫЙ ЗАКАЗ #{order_details.get('id', '')}</b>
+
+👤 <b>Клиент:</b> {order_details['name']}
+📞 <b>Телефон:</b> {order_details['phone']}
+💳 <b>Способ оплаты:</b> {payment_method}{receipt_info}
+
+{delivery_info}
+
+<b>Состав заказа:</b>
+{items_text}
+
+<b>💰 Итого к оплате:</b> <u>{order_details['total_price']} сом</u>
+
+💬 <b>Комментарий:</b> {order_details['comment'] or 'нет'}
+"""
+
+
+def order_totals_subqueries():
+    """Подзапросы суммы и числа позиций заказа для UPDATE по OuterRef('pk')"""
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    total = items.annotate(
+        total=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=10, decimal_places=2))
+    ).values('total')
+    count = items.annotate(count=Count('id')).values('count')
+    return {
+        'total_price': Coalesce(Subquery(total), Value(0), output_field=DecimalField(max_digits=10, decimal_places=2)),
+        'items_count': Coalesce(Subquery(count), Value(0)),
+    }
+
+
+def recalculate_order_totals(order_ids):
+    """Пересчитывает total_price и items_count заказов одним UPDATE"""
+    return Order.objects.filter(pk__in=order_ids).update(**order_totals_subqueries())
+
+
+def place_order(order_data, cart_items, total_price):
+    """
+    Создаёт заказ и все его позиции в одной транзакции.
+
+    order_data — поля Order (full_name, phone, ...), cart_items — результат
+    get_cart_products. Позиции пишутся одним bulk_create, а уведомление
+    менеджерам — в очередь core.outbox, поэтому заказ либо сохраняется
+    целиком вместе с уведомлением, либо не сохраняется вовсе.
+    Возвращает (order, order_details): у order уже заполнен кэш items.
+    """
+    with transaction.atomic():
+        # bulk_create не шлёт сигналы, поэтому итоги заказа пишутся сразу
+        order = Order.objects.create(
+            **order_data,
+            total_price=sum(item['item_total'] for item in cart_items),
+            items_count=len(cart_items),
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=item['product'] if item['model_type'] == 'product' else None,
+                akchii=item['product'] if item['model_type'] == 'akchii' else None,
+                quantity=item['quantity'],
+                price=item['unit_price'],
+            )
+            for item in cart_items
+        ])
+        order_details = build_order_details(order, cart_items, total_price)
+        enqueue_notification(
+            format_telegram_message(order_details),
+            document=order.check_file.name if order.check_file else '',
+            order=order,
+        )
+
+    # order.items.all() дальше не ходит в БД
+    order._prefetched_objects_cache = {'items': items}
+    return order, order_details
@@ -0,0 +1,104 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+# Перестановка живёт один час: в пределах часа страницы каталога стабильны,
+# а каждый новый час покупатели видят товары в новом порядке.
+SHUFFLE_PERIOD_SECONDS = 60 * 60
+SHUFFLE_CACHE_PREFIX = 'catalog_shuffle'
+SHUFFLE_VERSION_KEY = 'catalog_shuffle:version'
+
+
+def current_shuffle_seed():
+    """Номер текущего часового окна — общий сид для всех посетителей"""
+    return int(timezone.now().timestamp()) // SHUFFLE_PERIOD_SECONDS
+
+
+def shuffle_version():
+    """Текущее поколение закэшированных перестановок"""
+    return cache.get_or_set(SHUFFLE_VERSION_KEY, 1, None)
+
+
+def invalidate_shuffles():
+    """
+    Сбрасывает все перестановки (см. core.signals): новый или снова
+    доступный товар должен появиться в каталоге сразу, а удалённый — не
+    оставлять дыр на страницах.
+    """
+    try:
+        cache.incr(SHUFFLE_VERSION_KEY)
+    except ValueError:
+        cache.set(SHUFFLE_VERSION_KEY, 1, None)
+
+
+def shuffle_salt(seed, *parts):
+    """Соль перестановки для комбинации категории и ценового фильтра"""
+    raw = ':'.join(str(part) for part in parts)
+    return f"{seed}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+
+def shuffle_cache_key(seed, *parts):
+    return f"{SHUFFLE_CACHE_PREFIX}:{shuffle_version()}:{shuffle_salt(seed, *parts)}"
+
+
+def _shuffle_position(salt, pk):
+    return hashlib.blake2b(f"{salt}:{pk}".encode('ascii'), digest_size=8).digest()
+
+
+def shuffled_ids(queryset, seed, *key_parts, boost_discounts=True):
+    """
+    Возвращает перемешанный список ID товаров для queryset.
+
+    Список считается один раз на (сид, key_parts) и кладётся в кэш:
+    вместо ORDER BY RANDOM() на каждой странице делается один лёгкий
+    SELECT id, а дальше страницы режутся из готового списка.
+    Товары со скидкой поднимаются в начало выдачи.
+    """
+    key = shuffle_cache_key(seed, *key_parts)
+    ids = cache.get(key)
+    if ids is not None:
+        return ids
+
+    rows = queryset.annotate(
+        has_discount_order=Case(
+            When(skidka__isnull=False, skidka__lt=F('price'), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    ).order_by().values_list('id', 'has_discount_order')
+
+    # Место товара — хэш от соли и его id, а не random.shuffle: после сброса
+    # (invalidate_shuffles) остальные товары остаются на своих местах, и
+    # покупатель, листающий каталог, не видит повторов на следующих страницах
+    salt = shuffle_salt(seed, *key_parts)
+    positions = {
+        pk: (not (has_discount and boost_discounts), _shuffle_position(salt, pk))
+        for pk, has_discount in rows
+    }
+    ids = sorted(positions, key=positions.get)
+
+    # Таймаут с запасом на хвост часа; старые сиды вытесняются сами
+    cache.set(key, ids, SHUFFLE_PERIOD_SECONDS * 2)
+    return ids
+
+
+def paginate_shuffled(queryset, page_number, per_page, *key_parts):
+    """
+    Пагинация по закэшированной перестановке.
+
+    Страница достаётся одним запросом по первичному ключу (in_bulk),
+    порядок и состав страниц не меняются между переходами.
+    """
+    ids = shuffled_ids(queryset, current_shuffle_seed(), *key_parts)
+    paginator = Paginator(ids, per_page)
+    page_obj = paginator.get_page(page_number)
+
+    page_ids = list(page_obj.object_list)
+    # Фильтры queryset сохраняются: товар, снятый с продажи после построения
+    # перестановки, просто выпадет со страницы
+    products = queryset.in_bulk(page_ids)
+    page_obj.object_list = [products[pk] for pk in page_ids if pk in products]
+    return page_obj
@@ -0,0 +1,115 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .conditional import touch_content
+from .crm_search import index_customers, index_orders, unindex_customer, unindex_order
+from .images import admin_thumbnail_url, ensure_renditions
+from .models import Akchii, Category, Customer, MainCategory, Order, OrderItem, Product, Review, Shop
+from .price_bounds import invalidate_price_bounds
+from .search import fill_empty_index, index_objects, unindex_object
+from .services import recalculate_order_totals
+from .shuffle import invalidate_shuffles
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """
+    Любое изменение товара может сдвинуть границы цен в каталоге и состав
+    перемешанной выдачи. Сброс — после коммита: иначе другой воркер успеет
+    пересчитать их по старым данным и положить уже под новым поколением.
+    """
+    transaction.on_commit(invalidate_price_bounds)
+    transaction.on_commit(invalidate_shuffles)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, **kwargs):
+    """
+    Держит Order.total_price и items_count в согласии с позициями.
+    Пересчёт — один UPDATE с подзапросами, без гонки чтение-запись в Python.
+    """
+    recalculate_order_totals([instance.order_id])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Akchii)
+def create_image_renditions(sender, instance, **kwargs):
+    """Новый файл изображения получает рендишены сразу при загрузке"""
+    ensure_renditions(instance.image.name)
+
+
+@receiver(post_save, sender=Product)
+def create_admin_thumbnail(sender, instance, **kwargs):
+    """Миниатюра для списка в админке строится при загрузке, а не при первом показе"""
+    admin_thumbnail_url(instance.image.name)
+
+
+@receiver(post_save, sender=MainCategory)
+@receiver(post_delete, sender=MainCategory)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Akchii)
+def content_changed(sender, instance, **kwargs):
+    """
+    Сбрасывает ETag/Last-Modified публичных страниц (core.conditional).
+    Сохранение товара двигает его updated и сюда не попадает — так правка
+    в одной категории не сбрасывает валидаторы остальных. Отметка пишется в
+    той же транзакции, что и изменение, и при откате откатывается вместе с ним.
+    """
+    touch_content()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Akchii)
+def update_search_index(sender, instance, **kwargs):
+    """Индекс поиска обновляется в той же транзакции, что и товар"""
+    index_objects([instance])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Akchii)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_object(instance)
+
+
+@receiver(post_save, sender=Customer)
+def update_customer_search_index(sender, instance, **kwargs):
+    index_customers([instance])
+
+
+@receiver(post_delete, sender=Customer)
+def remove_customer_from_search_index(sender, instance, **kwargs):
+    unindex_customer(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_order_search_index(sender, instance, **kwargs):
+    index_orders([instance])
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_search_index(sender, instance, **kwargs):
+    unindex_order(instance)
+
+
+@receiver(post_migrate)
+def fill_search_index(sender, app_config=None, using='default', apps=None, **kwargs):
+    """
+    Миграция 0011 создаёт пустую таблицу поиска; заполняется она здесь
+    текущим стеммером, на моделях из состояния после миграций.
+    """
+    if app_config is None or app_config.name != 'core' or apps is None:
+        return
+    try:
+        models = {'product': apps.get_model('core', 'Product'), 'akchii': apps.get_model('core', 'Akchii')}
+    except LookupError:
+        return
+    fill_empty_index(models, connections[using])
@@ -0,0 +1,218 @@
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from PIL import Image
+
+try:
+    # Необязательная зависимость: без неё собираются только .gz
+    import brotli
+except ImportError:
+    brotli = None
+
+# Текстовые форматы, для которых имеет смысл держать сжатые копии рядом
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.xml', '.ico')
+# Сжатая копия пишется, только если она меньше оригинала хотя бы на 5%
+MIN_COMPRESSION_RATIO = 0.95
+# Палитра для PNG при STATIC_LOSSY_IMAGES: логотипы и иконки без фотографий почти не теряют в качестве
+PNG_PALETTE_COLORS = 256
+# Режимы PNG, которые Pillow пересохраняет без изменения пикселей
+LOSSLESS_PNG_MODES = ('1', 'L', 'LA', 'P', 'RGB', 'RGBA')
+# ManifestStaticFilesStorage добавляет 12 символов md5 перед расширением
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+# Бюджет размера по умолчанию (байты), если в STATIC_SIZE_BUDGET нет ни пути, ни расширения
+DEFAULT_SIZE_BUDGET = 200 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def encoding_qualities(header):
+    """Кодировки из Accept-Encoding с их q: 'gzip, br;q=0' -> {'gzip': 1.0, 'br': 0.0}"""
+    qualities = {}
+    for token in header.split(','):
+        name, *params = [part.strip() for part in token.split(';')]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities
+
+
+def accepts_encoding(header, encoding):
+    """
+    Принимает ли клиент encoding по заголовку Accept-Encoding. q=0 — явный
+    отказ; '*' покрывает кодировки, которые не перечислены отдельно.
+    """
+    qualities = encoding_qualities(header)
+    return qualities.get(encoding, qualities.get('*', 0.0)) > 0
+
+
+def optimize_image(path, lossy=False):
+    """
+    Пережимает PNG/JPEG на месте, если результат меньше оригинала.
+
+    По умолчанию только без потерь: PNG пересохраняется с максимальным
+    сжатием zlib, пиксели не меняются, JPEG не трогается. С lossy=True
+    (настройка STATIC_LOSSY_IMAGES) PNG переводится в палитру на 256 цветов
+    (как pngquant), а JPEG пересохраняется с исходными таблицами квантования
+    и оптимальным Хаффманом — это уже повторное кодирование с потерями.
+    Уже обработанные файлы меньше не становятся и остаются как есть, поэтому
+    повторный collectstatic ничего не портит. Возвращает (было, стало) в байтах.
+    """
+    before = os.path.getsize(path)
+    ext = os.path.splitext(path)[1].lower()
+    with Image.open(path) as image:
+        image.load()
+        fmt = image.format
+    temp_path = f"{path}.optimizing"
+    if fmt == 'PNG' and lossy and image.mode in ('RGB', 'RGBA'):
+        image.quantize(PNG_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE).save(
+            temp_path, 'PNG', optimize=True
+        )
+    elif fmt == 'PNG' and image.mode in LOSSLESS_PNG_MODES:
+        image.save(temp_path, 'PNG', optimize=True)
+    elif fmt == 'JPEG' and lossy and ext in ('.jpg', '.jpeg'):
+        image.save(temp_path, 'JPEG', quality='keep', optimize=True, progressive=True)
+    else:
+        return before, before
+
+    after = os.path.getsize(temp_path)
+    if after < before:
+        os.replace(temp_path, path)
+        return before, after
+    os.unlink(temp_path)
+    return before, before
+
+
+def write_compressed_siblings(path):
+    """Пишет path.gz и path.br рядом с файлом; возвращает список созданных путей"""
+    with open(path, 'rb') as source:
+        data = source.read()
+
+    encoded = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoded.append(('.br', brotli.compress(data, quality=11)))
+
+    written = []
+    for suffix, payload in encoded:
+        if len(payload) < len(data) * MIN_COMPRESSION_RATIO:
+            with open(path + suffix, 'wb') as target:
+                target.write(payload)
+            written.append(path + suffix)
+    return written
+
+
+def size_budget(name):
+    """Бюджет для файла: сначала точный путь в STATIC_SIZE_BUDGET, потом расширение"""
+    budgets = getattr(settings, 'STATIC_SIZE_BUDGET', {})
+    if name in budgets:
+        return budgets[name]
+    return budgets.get(os.path.splitext(name)[1].lower(), DEFAULT_SIZE_BUDGET)
+
+
+class OptimizedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Сборка статики для collectstatic:
+    1. картинки пережимаются в STATIC_ROOT до хэширования — хэш считается
+       от итогового содержимого; с потерями — только при STATIC_LOSSY_IMAGES;
+    2. ManifestStaticFilesStorage даёт имена с хэшем (logo2.3f1c9a0b2e4d.png)
+       и пишет staticfiles.json;
+    3. для текстовых файлов с хэшем рядом кладутся .gz и .br.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+
+        lossy = getattr(settings, 'STATIC_LOSSY_IMAGES', False)
+        for name in paths:
+            if name.lower().endswith(('.png', '.jpg', '.jpeg')):
+                before, after = optimize_image(self.path(name), lossy)
+                if after < before:
+                    logger.info("Сжато %s: %d КБ -> %d КБ", name, before // 1024, after // 1024)
+
+        # Хэш и копия с хэшем берутся из уже оптимизированного файла в STATIC_ROOT,
+        # а не из исходника в static/
+        paths = {name: (self, name) for name in paths}
+
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception) and \
+                    hashed_name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                write_compressed_siblings(self.path(hashed_name))
+            yield name, hashed_name, processed
+
+    def url_converter(self, name, hashed_files, template=None):
+        """
+        Ссылка из CSS на несуществующий файл не валит всю сборку: url()
+        остаётся как был (браузер получит тот же 404, что и раньше), а
+        в лог пишется предупреждение.
+        """
+        converter = super().url_converter(name, hashed_files, template)
+
+        def tolerant_converter(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError as e:
+                logger.warning("Ссылка из CSS оставлена как есть: %s", e)
+                return matchobj.group(0)
+
+        return tolerant_converter
+
+
+def serve_static(request, path):
+    """
+    Раздача собранной статики из STATIC_ROOT, когда перед Django нет nginx.
+
+    Файлы с хэшем в имени отдаются с Cache-Control immutable на год: при
+    изменении содержимого меняется и URL. Если клиент принимает br/gzip и
+    рядом лежит сжатая копия, отдаётся она.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    served_path, encoding = full_path, None
+    for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+        if accepts_encoding(accept_encoding, name) and os.path.isfile(full_path + suffix):
+            served_path, encoding = full_path + suffix, name
+            break
+
+    stat = os.stat(served_path)
+    immutable = bool(HASHED_NAME_RE.search(path))
+    if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    response = FileResponse(open(served_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    response['Content-Length'] = stat.st_size
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if os.path.isfile(full_path + '.gz') or os.path.isfile(full_path + '.br'):
+        response['Vary'] = 'Accept-Encoding'
+    return response
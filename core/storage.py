@@ -0,0 +1,91 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{64}$')
+# Незавершённые загрузки — сначала пишутся во временный файл рядом с целевым
+UPLOAD_TEMP_PREFIX = '.upload-'
+
+
+def digest_from_name(name):
+    """Хэш из имени products/93/93dd….png; для обычных имён — None"""
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    return stem if HASHED_NAME_RE.match(stem) else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище загрузок, где имя файла — SHA-256 его содержимого.
+
+    products/rose.png сохраняется как products/93/93dd….png. Повторная
+    загрузка той же картинки не пишет на диск ничего: возвращается имя уже
+    лежащего файла, и обе записи в БД ссылаются на него. Файлы, на которые
+    больше никто не ссылается, удаляет команда sweep_media.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя выбирает _save по содержимому; совпадение имён
+        # означает совпадение содержимого, поэтому суффиксы не нужны
+        return name
+
+    def hashed_name(self, name, digest):
+        directory, filename = posixpath.split(name)
+        ext = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], f"{digest}{ext}")
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        name = self.hashed_name(name, digest.hexdigest())
+
+        full_path = self.path(name)
+        try:
+            # Файл уже есть: обновляем mtime, иначе sweep_media сочтёт старую
+            # копию-сироту вышедшей из срока ожидания и удалит её раньше,
+            # чем закоммитится новая ссылка на неё
+            os.utime(full_path)
+            return name
+        except FileNotFoundError:
+            pass
+
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=UPLOAD_TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as destination:
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    destination.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            try:
+                # Жёсткая ссылка не перезаписывает файл: при одновременной
+                # загрузке одной картинки выигрывает первый, содержимое то же
+                os.link(temp_path, full_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                # ФС без жёстких ссылок
+                os.replace(temp_path, full_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return name
+
+
+media_storage = ContentAddressedStorage()
@@ -0,0 +1,212 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from django.urls import reverse
+
+from .conditional import content_changed_at, watermark
+from .models import Akchii, Category, Product
+
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_MIN_QUERY_LENGTH = 2
+# Сколько совпадений по префиксу просматривается, прежде чем выбрать лучшие
+SUGGEST_SCAN_LIMIT = 200
+# Как часто воркер сверяет индекс с БД (Max(updated) и COUNT на таблицу плюс строка ContentVersion)
+SUGGEST_REFRESH_SECONDS = 5
+# При большем числе изменённых товаров дешевле собрать индекс заново
+SUGGEST_INCREMENTAL_MAX = 500
+# Служебные слова, с которых не начинается подсказка
+STOP_WORDS = frozenset(('из', 'на', 'со', 'для', 'и', 'в', 'с'))
+
+
+def normalize_key(text):
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def name_keys(name):
+    """
+    Ключи для поиска с начала слова: «букет из 25 роз» -> «букет из 25 роз», «роз».
+    С чисел и предлогов подсказку никто не набирает — для них
+    ключей нет, название целиком доступно всегда.
+    """
+    words = normalize_key(name).split(' ')
+    return [
+        ' '.join(words[position:]) for position, word in enumerate(words)
+        if position == 0 or (len(word) >= SUGGEST_MIN_QUERY_LENGTH and not word.isdigit() and word not in STOP_WORDS)
+    ]
+
+
+class SuggestIndex:
+    """
+    Отсортированный массив ключей и bisect по префиксу.
+
+    Ключи и id записей лежат в двух параллельных списках, а не в кортежах,
+    одинаковые строки ключей хранятся в одном экземпляре: так индекс на
+    100 тыс. товаров заметно меньше (см. suggest_report). Индекс неизменяем:
+    обновление строит новые списки и подменяет ссылку, поэтому читатели
+    в других потоках не видят его наполовину изменённым.
+    """
+
+    def __init__(self, items, entries=None):
+        # items: {item_id: (тип, название, аргументы URL)}
+        self.items = items
+        if entries is None:
+            entries = (
+                (key, item_id) for item_id, (_, name, _) in items.items() for key in name_keys(name)
+            )
+        entries = sorted(entries)
+        shared = {}
+        self.keys = [shared.setdefault(key, key) for key, _ in entries]
+        self.ids = [item_id for _, item_id in entries]
+
+    def replaced(self, changed):
+        """Новый индекс, где записи из changed ({item_id: item или None}) заменены или удалены"""
+        items = dict(self.items)
+        added = []
+        for item_id, item in changed.items():
+            items.pop(item_id, None)
+            if item is not None:
+                items[item_id] = item
+                added.extend((key, item_id) for key in name_keys(item[1]))
+        # Оставшиеся ключи уже упорядочены, и Timsort сливает их с новыми за
+        # линейное время — дешевле, чем вставлять в середину массива по ключу
+        kept = [entry for entry in zip(self.keys, self.ids) if entry[1] not in changed]
+        return SuggestIndex(items, kept + added)
+
+    def lookup(self, query, limit=SUGGEST_LIMIT):
+        prefix = normalize_key(query)
+        if len(prefix) < SUGGEST_MIN_QUERY_LENGTH:
+            return []
+        position = bisect_left(self.keys, prefix)
+        found = {}
+        for offset in range(position, min(position + SUGGEST_SCAN_LIMIT, len(self.keys))):
+            key = self.keys[offset]
+            if not key.startswith(prefix):
+                break
+            item_id = self.ids[offset]
+            # Совпадение с начала названия важнее совпадения с середины
+            at_start = normalize_key(self.items[item_id][1]) == key
+            if item_id not in found or at_start:
+                found[item_id] = (not at_start, len(key), key)
+        best = sorted(found, key=found.get)[:limit]
+        return [self.items[item_id] for item_id in best]
+
+    def footprint(self):
+        """Примерный объём в памяти: массив, кортежи, строки ключей и записей (байты)"""
+        size = sys.getsizeof(self.keys) + sys.getsizeof(self.ids) + sys.getsizeof(self.items)
+        size += sum(sys.getsizeof(key) for key in {id(key): key for key in self.keys}.values())
+        for item_id, (kind, name, args) in self.items.items():
+            # Тип — общая интернированная строка, её не считаем
+            size += sys.getsizeof(item_id) + sys.getsizeof((kind, name, args)) + sys.getsizeof(name)
+            size += sys.getsizeof(args) + sum(sys.getsizeof(arg) for arg in args)
+        return size
+
+
+# URL строится только для выданных подсказок, а не для каждой записи индекса
+SUGGEST_URL_NAMES = {
+    'product': 'product_detail',
+    'akchii': 'discount_product_detail',
+    'category': 'catalog_by_category',
+}
+SUGGEST_SOURCES = {
+    'product': Product,
+    'akchii': Akchii,
+}
+
+
+def load_items(kind, queryset):
+    """{(тип, pk): запись} для товаров из queryset; недоступные — None (убрать из индекса)"""
+    return {
+        (kind, pk): (kind, name, (pk, slug)) if available else None
+        for pk, name, slug, available in queryset.order_by().values_list('id', 'name', 'slug', 'available')
+    }
+
+
+def load_categories():
+    return {
+        ('category', pk): ('category', name, (main_slug, slug))
+        for pk, name, slug, main_slug in Category.objects.order_by().values_list(
+            'id', 'name', 'slug', 'main_category__slug'
+        )
+    }
+
+
+def _watermarks():
+    """{тип: Max(updated)} — из БД, общей для всех воркеров"""
+    return {kind: watermark(model.objects.all()) for kind, model in SUGGEST_SOURCES.items()}
+
+
+class _State:
+    index = None
+    watermarks = None
+    content_changed = None
+    checked_at = 0.0
+
+
+_state = _State()
+_lock = threading.Lock()
+
+
+def _build():
+    # Отметки снимаются до чтения строк: сохранённое в это время попадёт в следующее обновление
+    watermarks, content_changed = _watermarks(), content_changed_at()
+    items = load_categories()
+    for kind, model in SUGGEST_SOURCES.items():
+        items.update((item_id, item) for item_id, item in load_items(kind, model.objects.all()).items() if item)
+    _state.index = SuggestIndex(items)
+    _state.watermarks, _state.content_changed = watermarks, content_changed
+
+
+def _refresh():
+    """
+    Догружает товары с updated новее отметки. Удаления и правки категорий
+    не двигают updated — их видно по строке ContentVersion (content_changed_at),
+    которую сигналы обновляют в той же транзакции. Тогда индекс собирается заново.
+    """
+    if content_changed_at() != _state.content_changed:
+        _build()
+        return
+    watermarks = _watermarks()
+    changed = {}
+    for kind, model in SUGGEST_SOURCES.items():
+        last, previous = watermarks[kind], _state.watermarks[kind]
+        if last == previous:
+            continue
+        queryset = model.objects.all()
+        if previous is not None:
+            # >=, а не >: у товара, сохранённого в ту же микросекунду, что и отметка, updated равен ей
+            queryset = queryset.filter(updated__gte=previous)
+        if queryset.count() > SUGGEST_INCREMENTAL_MAX:
+            _build()
+            return
+        changed.update(load_items(kind, queryset))
+    if changed:
+        _state.index = _state.index.replaced(changed)
+    _state.watermarks = watermarks
+
+
+def get_index():
+    """
+    Индекс подсказок этого процесса: строится при первом запросе и не чаще
+    раза в SUGGEST_REFRESH_SECONDS сверяется с БД.
+    """
+    now = time.monotonic()
+    if _state.index is not None and now - _state.checked_at < SUGGEST_REFRESH_SECONDS:
+        return _state.index
+    with _lock:
+        if _state.index is None:
+            _build()
+        elif now - _state.checked_at >= SUGGEST_REFRESH_SECONDS:
+            _refresh()
+        _state.checked_at = now
+    return _state.index
+
+
+def suggest(query, limit=SUGGEST_LIMIT):
+    """Подсказки по началу слов в названиях товаров, акций и категорий"""
+    return [
+        {'type': kind, 'name': name, 'url': reverse(SUGGEST_URL_NAMES[kind], args=args)}
+        for kind, name, args in get_index().lookup(query, min(limit, SUGGEST_MAX_LIMIT))
+    ]
@@ -1,53 +1,348 @@
-import requests
-from django.conf import settings
-from .models import TelegramManager
+import io
+import posixpath
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from django.conf import settings
-from .models import TelegramManager
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import TelegramManager, TelegramUploadStats
+
+TELEGRAM_TIMEOUT = 10
+# Ограничения Bot API: не больше ~30 сообщений в секунду всего
+# и ~1 сообщения в секунду в один чат
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_CHAT_RATE = 1
+TELEGRAM_MAX_WORKERS = 8
+
+# ok — доставлено всё, что просили; message_sent — текст ушёл в этом вызове
+# (даже если документ после него не прошёл); uploaded_bytes — сколько байт
+# файла ушло в Telegram; reused — документ доставлен по file_id без загрузки
+SendResult = namedtuple(
+    'SendResult', ['ok', 'error', 'file_id', 'message_sent', 'uploaded_bytes', 'reused'],
+    defaults=['', False, 0, False],
+)
+UPLOAD_COUNTERS = ('uploads', 'uploaded_bytes', 'reuses', 'saved_bytes')
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: acquire() ждёт, пока появится токен"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_global_bucket = TokenBucket(TELEGRAM_GLOBAL_RATE)
+_chat_buckets = {}
+_chat_buckets_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+
+def _throttle(chat_id):
+    """Ждёт разрешения и по лимиту чата, и по общему лимиту бота"""
+    with _chat_buckets_lock:
+        bucket = _chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = _chat_buckets[chat_id] = TokenBucket(TELEGRAM_CHAT_RATE)
+    bucket.acquire()
+    _global_bucket.acquire()
+
+
+def get_session():
+    """
+    Общая HTTP-сессия с пулом keep-alive соединений к Bot API.
+    TCP/TLS-рукопожатие делается один раз, а не на каждый запрос.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=TELEGRAM_MAX_WORKERS,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def telegram_api_url(method):
+    """URL метода Bot API; TELEGRAM_API_URL можно подменить на локальный фейковый сервер"""
+    base_url = getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org')
+    return f"{base_url}/bot{settings.TELEGRAM_BOT_TOKEN}/{method}"
 
-def send_telegram_notification(message, document_path=None):
-    """Send notification to all active Telegram managers, optionally with a document."""
+
+class MultipartFileStream:
+    """
+    multipart/form-data тело с файлом, которое читается из хранилища по частям.
+
+    requests видит объект с read() и __len__, ставит Content-Length и отдаёт
+    его в сокет блоками, поэтому фото чека не загружается в память целиком.
+    source — открытый файл (storage.open), тело закрывает его само.
+    """
+
+    def __init__(self, fields, file_field, source, filename, file_size):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        head = b''.join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode('utf-8')
+        tail = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+
+        self.file_size = file_size
+        self._length = len(head) + self.file_size + len(tail)
+        self._parts = [io.BytesIO(head), source, io.BytesIO(tail)]
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0).close()
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+        self._parts = []
+
+
+def record_upload_metrics(**counters):
+    """
+    Прибавляет счётчики (UPLOAD_COUNTERS) к строке TelegramUploadStats за сегодня.
+    saved_bytes — сколько байт не пришлось загружать благодаря file_id.
+    Вызывается из потока, который ждёт fan_out, а не из потоков пула:
+    те не закрывают свои соединения с БД.
+    """
+    counters = {key: value for key, value in counters.items() if value}
+    if not counters:
+        return
+    day = timezone.localdate()
+    increments = {key: F(key) + value for key, value in counters.items()}
+    if TelegramUploadStats.objects.filter(day=day).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            TelegramUploadStats.objects.create(day=day, **counters)
+    except IntegrityError:
+        # Строку за сегодня успел создать другой процесс
+        TelegramUploadStats.objects.filter(day=day).update(**increments)
+
+
+def get_upload_metrics(since=None):
+    """Сумма счётчиков загрузок с дня since (по умолчанию за всё время)"""
+    stats = TelegramUploadStats.objects.all()
+    if since:
+        stats = stats.filter(day__gte=since)
+    totals = stats.aggregate(**{key: Sum(key) for key in UPLOAD_COUNTERS})
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def _extract_file_id(response):
+    """file_id загруженного файла из ответа sendDocument"""
+    try:
+        result = response.json()['result']
+    except (ValueError, KeyError, TypeError):
+        return ''
+    for kind in ('document', 'animation', 'video', 'audio'):
+        if isinstance(result.get(kind), dict):
+            return result[kind].get('file_id', '')
+    return ''
+
+
+def _send_document(session, chat_id, document, document_file_id):
+    """
+    Отправляет документ: по готовому file_id без загрузки, иначе потоком из
+    хранилища (document — FieldFile). Возвращает SendResult с file_id,
+    который Telegram присвоил файлу.
+    """
+    if document_file_id:
+        _throttle(chat_id)
+        response = session.post(
+            telegram_api_url('sendDocument'),
+            data={'chat_id': chat_id, 'document': document_file_id},
+            timeout=TELEGRAM_TIMEOUT,
+        )
+        if response.status_code != 200:
+            return SendResult(False, f"sendDocument: HTTP {response.status_code} {response.text[:200]}")
+        return SendResult(True, '', document_file_id, reused=True)
+
+    # Свой файловый объект на каждую загрузку: параллельные потоки не делят позицию чтения
+    source = document.storage.open(document.name, 'rb')
+    body = MultipartFileStream(
+        {'chat_id': chat_id}, 'document', source, posixpath.basename(document.name), document.storage.size(document.name)
+    )
+    try:
+        _throttle(chat_id)
+        response = session.post(
+            telegram_api_url('sendDocument'),
+            data=body,
+            headers={'Content-Type': body.content_type},
+            timeout=TELEGRAM_TIMEOUT,
+        )
+    finally:
+        body.close()
+    if response.status_code != 200:
+        return SendResult(
+            False, f"sendDocument: HTTP {response.status_code} {response.text[:200]}", uploaded_bytes=body.file_size
+        )
+    return SendResult(True, '', _extract_file_id(response), uploaded_bytes=body.file_size)
+
+
+def send_to_chat(chat_id, message, document=None, document_file_id=''):
+    """
+    Отправляет сообщение и документ, если он есть, в один чат.
+    message=None — текст уже доставлен прошлой попыткой, уходит только документ.
+    Документ берётся по document_file_id, если он уже известен, иначе
+    загружается из хранилища. Возвращает SendResult.
+    """
     if not settings.TELEGRAM_BOT_TOKEN:
-        return False
-    
-    active_managers = TelegramManager.objects.filter(is_active=True, notify_orders=True)
-    
-    if not active_managers.exists():
-        return False
-    
-    success_count = 0
-    bot_token = settings.TELEGRAM_BOT_TOKEN
-    
-    for manager in active_managers:
-        # First, send the text message
-        url_text = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        return SendResult(False, "TELEGRAM_BOT_TOKEN не задан")
+
+    session = get_session()
+    message_sent = False
+    if message is not None:
         payload_text = {
-            'chat_id': manager.chat_id,
+            'chat_id': chat_id,
             'text': message,
             'parse_mode': 'HTML'
         }
-        
         try:
-            response = requests.post(url_text, json=payload_text)
-            if response.status_code == 200:
-                success_count += 1
-        except Exception as e:
-            print(f"Error sending Telegram message to {manager.chat_id}: {e}")
-            continue
-        
-        # Then, send the document if provided
-        if document_path:
-            try:
-                with open(document_path, 'rb') as file:
-                    url_doc = f"https://api.telegram.org/bot{bot_token}/sendDocument"
-                    files = {'document': file}
-                    data = {'chat_id': manager.chat_id}
-                    response = requests.post(url_doc, files=files, data=data)
-            except Exception as e:
-                print(f"Error sending document to {manager.chat_id}: {e}")
+            _throttle(chat_id)
+            response = session.post(telegram_api_url('sendMessage'), json=payload_text, timeout=TELEGRAM_TIMEOUT)
+        except requests.RequestException as e:
+            return SendResult(False, f"sendMessage: {e}")
+        if response.status_code != 200:
+            return SendResult(False, f"sendMessage: HTTP {response.status_code} {response.text[:200]}")
+        message_sent = True
+
+    if document or document_file_id:
+        try:
+            result = _send_document(session, chat_id, document, document_file_id)
+        except (OSError, requests.RequestException) as e:
+            result = SendResult(False, f"sendDocument: {e}")
+        return result._replace(message_sent=message_sent)
+
+    return SendResult(True, '', '', message_sent)
+
+
+def fan_out(chat_ids, message, document=None, document_file_id='', message_done=(), document_done=()):
+    """
+    Параллельно отправляет сообщение во все чаты.
+    Возвращает {chat_id: SendResult} по каждому получателю.
+
+    message_done и document_done — чаты, куда текст или документ уже
+    доставлены прошлой попыткой: туда уходит только недостающая часть.
+    Документ загружается в Telegram только один раз: первые получатели
+    обслуживаются по очереди, пока загрузка не вернёт file_id, а остальные
+    получают файл по этому file_id параллельно. Трафик загрузок и
+    сэкономленные байты (только по успешным отправкам по file_id)
+    записываются в TelegramUploadStats.
+    """
+    def send(chat_id, file_id):
+        needs_document = document and chat_id not in document_done
+        return send_to_chat(
+            chat_id,
+            None if chat_id in message_done else message,
+            document if needs_document else None,
+            file_id if needs_document else '',
+        )
+
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return {}
+
+    results = {}
+    if document and not document_file_id:
+        uploading = [chat_id for chat_id in chat_ids if chat_id not in document_done]
+        while uploading and not document_file_id:
+            chat_id = uploading.pop(0)
+            chat_ids.remove(chat_id)
+            results[chat_id] = send(chat_id, '')
+            document_file_id = results[chat_id].file_id
+
+    if chat_ids:
+        workers = min(TELEGRAM_MAX_WORKERS, len(chat_ids))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                chat_id: executor.submit(send, chat_id, document_file_id)
+                for chat_id in chat_ids
+            }
+        results.update({chat_id: future.result() for chat_id, future in futures.items()})
+
+    if document:
+        _record_results(document, results.values())
+    return results
+
+
+def _record_results(document, results):
+    """Учитывает загрузки и успешные отправки по file_id одного вызова fan_out"""
+    uploads = [result.uploaded_bytes for result in results if result.uploaded_bytes]
+    reuses = sum(1 for result in results if result.ok and result.reused)
+    saved_bytes = 0
+    if reuses:
+        try:
+            saved_bytes = document.storage.size(document.name) * reuses
+        except OSError:
+            pass
+    record_upload_metrics(
+        uploads=len(uploads), uploaded_bytes=sum(uploads), reuses=reuses, saved_bytes=saved_bytes,
+    )
+
+
+def send_telegram_notification(message, document=None):
+    """
+    Send notification to all active Telegram managers, optionally with a document (FieldFile).
+    Returns {chat_id: SendResult} for every recipient (empty dict if nobody to notify).
+    """
+    if not settings.TELEGRAM_BOT_TOKEN:
+        return {}
+    
+    chat_ids = TelegramManager.objects.filter(
+        is_active=True, notify_orders=True
+    ).values_list('chat_id', flat=True)
     
-    return success_count > 0
+    results = fan_out(chat_ids, message, document)
+    for chat_id, result in results.items():
+        if not result.ok:
+            print(f"Error sending Telegram message to {chat_id}: {result.error}")
+    return results
 
 
 
@@ -56,14 +351,14 @@ def set_webhook():
     if not settings.TELEGRAM_BOT_TOKEN or not settings.WEBHOOK_URL:
         return False
     
-    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/setWebhook"
+    url = telegram_api_url('setWebhook')
     payload = {
         'url': settings.WEBHOOK_URL,
         'allowed_updates': ['message']
     }
     
     try:
-        response = requests.post(url, json=payload)
+        response = get_session().post(url, json=payload, timeout=TELEGRAM_TIMEOUT)
         return response.status_code == 200
     except Exception as e:
         print(f"Error setting webhook: {e}")
@@ -0,0 +1,26 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def deferred_stylesheet(path):
+    """
+    Подключает CSS-бандл без блокировки отрисовки.
+
+    Использование:
+        {% load assets %}
+        {% deferred_stylesheet 'css/pages/shop/catalog.css' %}
+
+    Стили первого экрана при этом остаются инлайном в <style data-critical>
+    перед тегом (см. команду extract_inline_css). Позиция <link> в документе
+    сохраняет порядок каскада, когда бы файл ни загрузился.
+    """
+    url = static(path)
+    return format_html(
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        url, url,
+    )
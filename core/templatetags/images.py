@@ -0,0 +1,47 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from core.images import get_renditions, rendition_name, supported_formats
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', css_class='', loading='lazy', **attrs):
+    """
+    <picture> с рендишенами AVIF/WebP и JPEG-запасным <img srcset>.
+
+    Использование:
+        {% load images %}
+        {% responsive_image product.image alt=product.name sizes="(max-width: 576px) 50vw, 250px" css_class="product-img" %}
+
+    Если рендишенов ещё нет, выводится обычный <img> с оригиналом.
+    """
+    if not image:
+        return ''
+
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+    manifest = get_renditions(image.name)
+    if not manifest.get('jpg'):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}"{}>',
+            image.url, alt, css_class, loading, extra,
+        )
+
+    def srcset(ext):
+        return ', '.join(
+            f"{default_storage.url(rendition_name(image.name, width, ext))} {width}w"
+            for width in manifest[ext]
+        )
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset(ext), sizes) for ext, mime, _, _ in supported_formats()
+         if ext != 'jpg' and manifest.get(ext)),
+    )
+    fallback_url = default_storage.url(rendition_name(image.name, manifest['jpg'][-1], 'jpg'))
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}"{}></picture>',
+        sources, fallback_url, srcset('jpg'), sizes, alt, css_class, loading, extra,
+    )
@@ -0,0 +1,647 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .management.commands.check_query_plans import TABLE_SCAN_RE, hot_queries
+from .models import (
+    Akchii, Category, Customer, MainCategory, NotificationOutbox, Order, OrderItem, Product, Shop,
+    TelegramManager, TelegramUploadStats,
+)
+from .outbox import deliver
+from . import images as images_module
+from . import shuffle as shuffle_module
+from . import suggest as suggest_module
+from .conditional import watermark
+from .crm_search import customer_search_filter
+from .middleware import CompressionMiddleware, brotli, minify_html
+from .static_assets import accepts_encoding, optimize_image, serve_static
+from .storage import media_storage
+from .telegram_bot import get_upload_metrics
+from .views import get_cart_products
+
+
+# Шаблоны рендерятся без собранного collectstatic манифеста: staticfiles/ не в git
+PLAIN_STATIC_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def make_catalog(count, prefix='p'):
+    """
+    Категория и count товаров и акций; bulk_create — без сигналов и картинок.
+    У каждой строки своё имя файла: поиск миниатюр и рендишенов идёт по строкам.
+    """
+    main_category, _ = MainCategory.objects.get_or_create(slug='flowers', defaults={'name': 'Цветы'})
+    category, _ = Category.objects.get_or_create(slug='roses', defaults={'name': 'Розы', 'main_category': main_category})
+    Product.objects.bulk_create(
+        Product(
+            category=category, product_type='flower', name=f'Роза {prefix}{i}', slug=f'{prefix}{i}',
+            image=f'products/{prefix}{i}.png', description='-', price=Decimal(100 + i), skidka=Decimal(90 + i) if i % 3 == 0 else None,
+        )
+        for i in range(count)
+    )
+    Akchii.objects.bulk_create(
+        Akchii(
+            name=f'Акция {prefix}{i}', slug=f'a{prefix}{i}', image=f'akchii/{prefix}{i}.png', description='-',
+            price=Decimal(500 + i), skidka=Decimal(400),
+        )
+        for i in range(count)
+    )
+    return category
+
+
+def cursor_token(values, direction='next'):
+    payload = json.dumps({'v': values, 'd': direction}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(30)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        first = self.client.get('/catalog/', {'sort': 'new'}).context['products']
+        for values in (['abc', 'x'], [None, None], [[1], {'a': 1}], ['NaN', '1'], ['1']):
+            for direction in ('next', 'prev'):
+                for url, params in (('/catalog/', {'sort': 'new'}), ('/catalog/', {'sort': 'price'}), ('/discounts/', {})):
+                    with self.subTest(url=url, params=params, values=values, direction=direction):
+                        params = dict(params, cursor=cursor_token(values, direction))
+                        response = self.client.get(url, params)
+                        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/catalog/', {'sort': 'new', 'cursor': cursor_token(['abc', 'x'])})
+        self.assertEqual(
+            [product.pk for product in response.context['products']],
+            [product.pk for product in first],
+        )
+
+    def test_cursor_walks_all_pages(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'sort': 'price'}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.client.get('/catalog/', params).context['products']
+            seen.extend(product.pk for product in page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), Product.objects.filter(available=True).count())
+
+    def test_unknown_sort_uses_numbered_pages(self):
+        response = self.client.get('/catalog/', {'sort': 'bogus'})
+        self.assertFalse(response.context['keyset'])
+        self.assertNotContains(response, 'cursor=')
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload or {}
+        self.text = json.dumps(self.payload)
+
+    def json(self):
+        return self.payload
+
+
+class FakeTelegramSession:
+    """Записывает вызовы Bot API; fail_document / fail_message — какие вызовы падают"""
+
+    def __init__(self):
+        self.calls = []
+        self.fail_document = False
+        self.fail_message = set()
+
+    def post(self, url, data=None, json=None, headers=None, timeout=None):
+        method = url.rsplit('/', 1)[1]
+        if hasattr(data, 'read'):
+            chat_id, upload = None, data.read()
+        else:
+            chat_id, upload = (json or data)['chat_id'], None
+        self.calls.append((method, chat_id, upload is not None))
+        if method == 'sendMessage':
+            if chat_id in self.fail_message:
+                return FakeResponse(500)
+            return FakeResponse(200, {'ok': True})
+        if self.fail_document:
+            return FakeResponse(500)
+        return FakeResponse(200, {'ok': True, 'result': {'document': {'file_id': 'FILE1'}}})
+
+    def count(self, method):
+        return sum(1 for call in self.calls if call[0] == method)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='test')
+class OutboxDeliveryTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.session = FakeTelegramSession()
+        for patcher in (
+            mock.patch('core.telegram_bot.get_session', return_value=self.session),
+            mock.patch('core.telegram_bot._throttle'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        document = media_storage.save('checks/check.jpg', ContentFile(b'receipt' * 100))
+        self.entry = NotificationOutbox.objects.create(
+            message='Заказ №1', document=document, recipients=['100', '200'],
+        )
+
+    def test_failed_upload_does_not_resend_text(self):
+        self.session.fail_document = True
+        for _ in range(3):
+            deliver(self.entry)
+        self.assertEqual(self.session.count('sendMessage'), 2)
+        self.assertEqual(sorted(self.entry.delivered), ['100', '200'])
+        self.assertEqual(self.entry.documents_delivered, [])
+        self.assertEqual(self.entry.status, NotificationOutbox.STATUS_PENDING)
+
+        self.session.fail_document = False
+        deliver(self.entry)
+        self.assertEqual(self.session.count('sendMessage'), 2)
+        self.assertEqual(sorted(self.entry.documents_delivered), ['100', '200'])
+        self.assertEqual(self.entry.status, NotificationOutbox.STATUS_SENT)
+        self.assertEqual(self.entry.document_file_id, 'FILE1')
+        # Файл загружен один раз, второй чат получил его по file_id
+        last_attempt = self.session.calls[-2:]
+        self.assertEqual(sum(1 for method, _, uploaded in last_attempt if uploaded), 1)
+
+    def test_retry_sends_only_missing_parts(self):
+        self.session.fail_message = {'200'}
+        deliver(self.entry)
+        self.assertEqual(self.entry.delivered, ['100'])
+        self.assertEqual(self.entry.documents_delivered, ['100'])
+        self.assertEqual(self.entry.pending_recipients, ['200'])
+
+        self.session.fail_message = set()
+        self.session.calls = []
+        deliver(self.entry)
+        self.assertEqual(self.session.calls, [('sendMessage', '200', False), ('sendDocument', '200', False)])
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, NotificationOutbox.STATUS_SENT)
+        self.assertEqual(sorted(self.entry.delivered), ['100', '200'])
+
+    def test_upload_metrics_count_only_successful_reuses(self):
+        self.entry.recipients = ['100', '200', '300']
+        self.session.fail_message = {'300'}
+        deliver(self.entry)
+        # Один раз загружен, '200' получил по file_id, '300' не дошёл до документа
+        self.assertEqual(get_upload_metrics(), {
+            'uploads': 1, 'uploaded_bytes': 700, 'reuses': 1, 'saved_bytes': 700,
+        })
+
+        self.session.fail_message = set()
+        deliver(self.entry)
+        self.assertEqual(get_upload_metrics(), {
+            'uploads': 1, 'uploaded_bytes': 700, 'reuses': 2, 'saved_bytes': 1400,
+        })
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class AdminQueryCountTests(TestCase):
+    """
+    Каждая страница админки выполняет одно и то же число запросов при одной
+    строке и при ROWS строках — без N+1 на строку списка или инлайна.
+    """
+    ROWS = 10
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.media_root = media_root
+        for folder in ('products', 'akchii'):
+            os.makedirs(os.path.join(media_root, folder))
+
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(user)
+
+    def assertConstantQueries(self, url, add_rows):
+        # Первый запрос прогревает кэши (миниатюры, рендишены), считается второй
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as single:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Журнал запросов очищается следующим запросом клиента — считаем сразу
+        expected = len(single)
+        add_rows()
+        self.client.get(url)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def changelist(self, model):
+        return reverse(f'admin:core_{model._meta.model_name}_changelist')
+
+    def make_catalog(self, count, prefix='p'):
+        # Файлы по путям из make_catalog, чтобы миниатюры и рендишены реально строились
+        make_catalog(count, prefix)
+        for model in (Product, Akchii):
+            for name in model.objects.values_list('image', flat=True):
+                path = os.path.join(self.media_root, name)
+                if not os.path.exists(path):
+                    Image.new('RGB', (200, 200), 'red').save(path)
+
+    def make_orders(self, count, prefix='o'):
+        shop = Shop.objects.first() or Shop.objects.create(
+            name='Центр', address='ул. Ленина, 1', phone='+79990000000', work_hours='9-21',
+        )
+        return Order.objects.bulk_create(
+            Order(full_name=f'Иван {prefix}{i}', phone='+79990000000', shop=shop) for i in range(count)
+        )
+
+    def add_rows(self, model, count, prefix):
+        if model in (Product, Akchii):
+            self.make_catalog(count, prefix)
+        elif model is Category:
+            for i in range(count):
+                main_category = MainCategory.objects.create(name=f'Раздел {prefix}{i}', slug=f'main-{prefix}{i}')
+                Category.objects.create(name=f'Категория {prefix}{i}', slug=f'{prefix}{i}', main_category=main_category)
+        elif model is MainCategory:
+            MainCategory.objects.bulk_create(
+                MainCategory(name=f'Раздел {prefix}{i}', slug=f'{prefix}{i}') for i in range(count)
+            )
+        elif model is Shop:
+            Shop.objects.bulk_create(
+                Shop(name=f'Магазин {prefix}{i}', address='-', phone='+79990000000', work_hours='9-21')
+                for i in range(count)
+            )
+        elif model is Order:
+            self.make_orders(count, prefix)
+        elif model is Customer:
+            Customer.objects.bulk_create(
+                Customer(full_name=f'Мария {prefix}{i}', phone='+79990000000', birthday=date(1990, 1, 1 + i))
+                for i in range(count)
+            )
+        elif model is TelegramManager:
+            for i in range(count):
+                user = get_user_model().objects.create_user(f'manager-{prefix}{i}')
+                TelegramManager.objects.create(user=user, chat_id=f'{prefix}{i}')
+        elif model is NotificationOutbox:
+            NotificationOutbox.objects.bulk_create(
+                NotificationOutbox(order=order, message='-', recipients=['100'])
+                for order in self.make_orders(count, prefix)
+            )
+        elif model is TelegramUploadStats:
+            first_day = date(2026, 1, 1) + timedelta(days=100 if prefix == 'n' else 0)
+            TelegramUploadStats.objects.bulk_create(
+                TelegramUploadStats(day=first_day + timedelta(days=i)) for i in range(count)
+            )
+        else:
+            self.fail(f'Нет данных для проверки админки {model.__name__}')
+
+    def test_changelists(self):
+        models = [model for model in admin.site._registry if model._meta.app_label == 'core']
+        for model in models:
+            # Каждая модель — на своих данных: точка сохранения откатывается после проверки
+            with self.subTest(model.__name__), transaction.atomic():
+                self.add_rows(model, 1, 'one')
+                self.assertConstantQueries(
+                    self.changelist(model), lambda: self.add_rows(model, self.ROWS - 1, 'n'),
+                )
+                transaction.set_rollback(True)
+
+    def test_order_change_form_with_items(self):
+        self.make_catalog(self.ROWS)
+        order = self.make_orders(1)[0]
+        products = list(Product.objects.all())
+        promos = list(Akchii.objects.all())
+
+        def add_items(items):
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, akchii=promo, price=product.price)
+                for product, promo in items
+            )
+
+        add_items(zip(products[:1], promos[:1]))
+        self.assertConstantQueries(
+            reverse('admin:core_order_change', args=[order.pk]), lambda: add_items(zip(products[1:], promos[1:])),
+        )
+
+
+class MediaSweepTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def age(self, name, days=3):
+        old = time.time() - days * 24 * 60 * 60
+        os.utime(media_storage.path(name), (old, old))
+
+    def test_reused_orphan_survives_sweep(self):
+        orphan = media_storage.save('checks/old.jpg', ContentFile(b'same receipt'))
+        stale = media_storage.save('checks/stale.jpg', ContentFile(b'other receipt'))
+        self.age(orphan)
+        self.age(stale)
+        # Та же картинка загружена снова, а запись со ссылкой ещё не закоммичена
+        self.assertEqual(media_storage.save('checks/new.jpg', ContentFile(b'same receipt')), orphan)
+
+        call_command('sweep_media', stdout=StringIO())
+        self.assertTrue(media_storage.exists(orphan))
+        self.assertFalse(media_storage.exists(stale))
+
+
+class StaticImageTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'gradient.png')
+        gradient = Image.new('RGB', (256, 64))
+        gradient.putdata([(x, y * 4, (x + y) % 256) for y in range(64) for x in range(256)])
+        gradient.save(self.path, compress_level=0)
+        self.pixels = list(gradient.getdata())
+
+    def test_png_is_lossless_by_default(self):
+        before, after = optimize_image(self.path)
+        self.assertLess(after, before)
+        with Image.open(self.path) as image:
+            self.assertEqual(image.mode, 'RGB')
+            self.assertEqual(list(image.getdata()), self.pixels)
+
+    def test_palette_only_when_lossy(self):
+        optimize_image(self.path, lossy=True)
+        with Image.open(self.path) as image:
+            self.assertEqual(image.mode, 'P')
+
+
+class StaticServeTests(SimpleTestCase):
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        static_override = override_settings(STATIC_ROOT=static_root)
+        static_override.enable()
+        self.addCleanup(static_override.disable)
+        for name, body in (('app.css', b'body{}'), ('app.css.gz', b'gz'), ('app.css.br', b'br')):
+            with open(os.path.join(static_root, name), 'wb') as f:
+                f.write(body)
+
+    def encoding(self, accept_encoding):
+        request = RequestFactory().get('/static/app.css', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return serve_static(request, 'app.css').get('Content-Encoding')
+
+    def test_q_zero_refuses_encoding(self):
+        self.assertEqual(self.encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(self.encoding('gzip, br;q=0'), 'gzip')
+        self.assertEqual(self.encoding('br;q=0, gzip;q=0'), None)
+        # Подстрока в чужом токене — не согласие на кодировку
+        self.assertEqual(self.encoding('x-gzip-like, brx'), None)
+
+    def test_wildcard(self):
+        self.assertTrue(accepts_encoding('*', 'br'))
+        self.assertFalse(accepts_encoding('*, br;q=0', 'br'))
+        self.assertTrue(accepts_encoding('identity;q=1, *;q=0.5', 'gzip'))
+
+
+class HtmlResponseTests(SimpleTestCase):
+    def test_minify_keeps_quoted_gt_in_attributes(self):
+        html = '<div data-x="a >  b"   title=\'c >\n d\'>\n   текст    здесь\n</div>'
+        self.assertEqual(
+            minify_html(html),
+            '<div data-x="a >  b"   title=\'c >\n d\'>\nтекст здесь\n</div>',
+        )
+
+    def encoding(self, accept_encoding):
+        middleware = CompressionMiddleware(lambda request: HttpResponse('<p>роза</p>' * 500))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request).get('Content-Encoding')
+
+    def test_compression_respects_q_zero(self):
+        self.assertEqual(self.encoding('gzip, br;q=0'), 'gzip')
+        self.assertEqual(self.encoding('br;q=0, gzip;q=0'), None)
+        self.assertEqual(self.encoding('gzip;q=0, *'), None if brotli is None else 'br')
+        if brotli is not None:
+            self.assertEqual(self.encoding('gzip, br'), 'br')
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(3)
+
+    def test_category_change_resets_etag(self):
+        etag = self.client.get('/discounts/')['ETag']
+        self.assertEqual(self.client.get('/discounts/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Сброс кэша не меняет валидаторы: отметка изменений хранится в БД
+        cache.clear()
+        self.assertEqual(self.client.get('/discounts/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Category.objects.filter(slug='roses').get().save()
+        self.assertEqual(self.client.get('/discounts/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SuggestIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(3)
+
+    def setUp(self):
+        patcher = mock.patch.object(suggest_module, '_state', suggest_module._State())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def names(self, query):
+        # Индекс сверяется с БД не чаще раза в SUGGEST_REFRESH_SECONDS — имитируем, что время прошло
+        suggest_module._state.checked_at = 0.0
+        return sorted(item['name'] for item in suggest_module.suggest(query))
+
+    def test_deletes_and_category_changes_are_seen(self):
+        self.assertEqual(self.names('роза'), ['Роза p0', 'Роза p1', 'Роза p2'])
+        Product.objects.get(slug='p1').delete()
+        self.assertEqual(self.names('роза'), ['Роза p0', 'Роза p2'])
+
+        category = Category.objects.get(slug='roses')
+        category.name = 'Пионы'
+        category.save()
+        self.assertEqual(self.names('пион'), ['Пионы'])
+
+    def test_queryset_delete_is_seen(self):
+        self.names('роза')
+        # QuerySet.delete шлёт post_delete по каждой строке — сигнал отмечает ContentVersion
+        Product.objects.filter(slug='p2').delete()
+        self.assertEqual(self.names('роза'), ['Роза p0', 'Роза p1'])
+
+
+class CustomerSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # create(), а не bulk_create: индекс имён пополняется сигналом
+        for full_name, spouse_name in (('Иван Петров', ''), ('иван сидоров', 'Ия'), ('Ия Ким', ''), ('Азамат Ли', '')):
+            Customer.objects.create(full_name=full_name, spouse_name=spouse_name, phone='')
+
+    def names(self, query):
+        return sorted(Customer.objects.filter(customer_search_filter(query)).values_list('full_name', flat=True))
+
+    def test_short_query_ignores_case(self):
+        for query in ('ив', 'ИВ', 'Ив', 'иВ'):
+            with self.subTest(query):
+                self.assertEqual(self.names(query), ['Иван Петров', 'иван сидоров'])
+
+    def test_short_words_are_not_dropped(self):
+        self.assertEqual(self.names('иван ия'), ['иван сидоров'])
+        self.assertEqual(self.names('ким ИЯ'), ['Ия Ким'])
+        self.assertEqual(self.names('азамат ли'), ['Азамат Ли'])
+        self.assertEqual(self.names('азамат ки'), [])
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class StorefrontQueryCountTests(TestCase):
+    """Манифесты рендишенов не стоят запроса к общему кэшу на каждую карточку"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        patcher = mock.patch.object(images_module, '_local_manifests', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.category = make_catalog(0)
+
+    def add_products(self, start, count):
+        for i in range(start, start + count):
+            image = BytesIO()
+            Image.new('RGB', (400, 300), (i, 0, 0)).save(image, 'JPEG')
+            # create(): сигнал строит рендишены, имя файла — по хэшу содержимого
+            Product.objects.create(
+                category=self.category, product_type='flower', name=f'Роза {i}', slug=f'p{i}',
+                image=ContentFile(image.getvalue(), name='rose.jpg'), description='-', price=Decimal(100),
+            )
+
+    def test_catalog_queries_do_not_grow_with_products(self):
+        self.add_products(0, 1)
+        self.client.get('/catalog/', {'sort': 'new'})
+        with CaptureQueriesContext(connection) as single:
+            response = self.client.get('/catalog/', {'sort': 'new'})
+        self.assertContains(response, '<picture>')
+        expected = len(single)
+
+        self.add_products(1, 9)
+        self.client.get('/catalog/', {'sort': 'new'})
+        with self.assertNumQueries(expected):
+            response = self.client.get('/catalog/', {'sort': 'new'})
+        self.assertContains(response, '<picture>', count=10)
+
+
+class BrokenImageTests(TestCase):
+    """Битый файл не ломает сохранение, а попадает в лог core"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        os.makedirs(os.path.join(media_root, 'products'))
+        with open(os.path.join(media_root, 'products', 'broken.jpg'), 'wb') as f:
+            f.write(b'not an image')
+
+    def test_renditions_failure_is_logged(self):
+        with self.assertLogs('core.images', 'WARNING') as logs:
+            images_module.ensure_renditions('products/broken.jpg')
+        self.assertIn('products/broken.jpg', logs.output[0])
+        self.assertIn('Traceback', logs.output[0])
+
+    def test_admin_thumbnail_failure_is_logged(self):
+        with self.assertLogs('core.images', 'WARNING') as logs:
+            self.assertEqual(images_module.admin_thumbnail_urls(['products/broken.jpg']), {'products/broken.jpg': None})
+        self.assertIn('products/broken.jpg', logs.output[0])
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class CatalogShuffleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(3)
+
+    def test_cache_key_uses_applied_price_filter(self):
+        with mock.patch.object(shuffle_module, 'shuffle_cache_key', wraps=shuffle_module.shuffle_cache_key) as key:
+            for params in ({}, {'min_price': 'x1'}, {'min_price': 'x2', 'max_price': '-5'}, {'min_price': '101'}):
+                self.assertEqual(self.client.get('/catalog/', params).status_code, 200)
+        keys = [call.args for call in key.call_args_list]
+        # Нечисловой фильтр не применяется — та же перестановка, что и без фильтра
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], keys[2])
+        self.assertNotEqual(keys[0], keys[3])
+
+
+class CartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(3)
+
+    def test_cart_prices_keep_two_decimal_places(self):
+        discounted = Product.objects.get(slug='p0')
+        regular = Product.objects.get(slug='p1')
+        promo = Akchii.objects.get(slug='ap0')
+        lines, total, _, _ = get_cart_products({
+            str(discounted.pk): 2, f'product_{regular.pk}': 1, f'akchii_{promo.pk}': 1,
+        })
+        self.assertEqual([str(line['unit_price']) for line in lines], ['90.00', '101.00', '400.00'])
+        self.assertEqual(str(total), '681.00')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'планы проверяются через EXPLAIN QUERY PLAN SQLite')
+class QueryPlanTests(TestCase):
+    """Горячие запросы (check_query_plans.hot_queries) не должны сканировать таблицы целиком"""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog(20)
+
+    def test_hot_queries_use_indexes(self):
+        for label, queryset in hot_queries().items():
+            with self.subTest(label):
+                plan = queryset.explain()
+                self.assertEqual(TABLE_SCAN_RE.findall(plan), [], plan)
+
+    def test_watermarks_use_indexes(self):
+        # Агрегат не объясняется через QuerySet.explain — берём SQL, который выполнил watermark
+        for label, queryset in {
+            'products': Product.objects.all(),
+            'category': Product.objects.filter(category__slug='roses', category__main_category__slug='flowers'),
+            'main category': Product.objects.filter(category__main_category__slug='flowers'),
+            'discounts': Akchii.objects.all(),
+        }.items():
+            with self.subTest(label):
+                with CaptureQueriesContext(connection) as queries:
+                    watermark(queryset)
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+                    plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                self.assertEqual(TABLE_SCAN_RE.findall(plan), [], plan)
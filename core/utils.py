@@ -1,8 +1,7 @@
 from django.utils import timezone
-from django.db.models import Q
 
+from .birthdays import upcoming_birthdays
 from .telegram_bot import send_telegram_notification
-from .models import Customer 
 
 
 def send_daily_report():
@@ -11,13 +10,11 @@ def send_daily_report():
     """
     today = timezone.localdate()
 
-    customers_birthdays = Customer.objects.filter(
-        Q(spouse_birthday__month=today.month, spouse_birthday__day=today.day) |
-        Q(birthday__month=today.month, birthday__day=today.day)
-    )
+    # Поиск по индексам birthday_mmdd / spouse_birthday_mmdd; строки читаются
+    # порциями, а не все сразу в кэш QuerySet
+    customers_birthdays = upcoming_birthdays(days=1, today=today)
     lines = []
-    print(customers_birthdays)
-    for customer in customers_birthdays:
+    for customer in customers_birthdays.iterator(chunk_size=500):
         lines.append(f"""
 Имя клиента - {customer.full_name or "не указано"}
 Телефон клиента - {customer.phone or "не указано"}
@@ -35,7 +32,7 @@ def send_daily_report():
     message = (
         f"<b>Ежедневное уведомление — {today.strftime('%d.%m.%Y')}</b>\n"
         "Дни рождения:\n" +
-        "\n".join(lines) or "Нет дней рождения сегодня."
+        ("\n".join(lines) or "Нет дней рождения сегодня.")
     )
 
     send_telegram_notification(message)
@@ -1,16 +1,33 @@
 import random
-from django.db.models import Min, Max, Q
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import Floor
 from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_control, never_cache
 from django.views.generic import ListView, CreateView, UpdateView
 from django.urls import reverse_lazy
 
-from .telegram_bot import send_telegram_notification
-from .models import Product, Category, MainCategory, Order, OrderItem, Shop, Review, Customer
+from .shuffle import paginate_shuffled
+from .conditional import (
+    catalog_validators, conditional_page, discounts_validators, index_validators, product_validators,
+)
+from .pagination import KeysetPaginator
+from .price_bounds import get_price_bounds
+from .search import search_products
+from .suggest import SUGGEST_LIMIT, suggest
+from .crm_search import customer_search_filter
+from .services import place_order
+from .models import Product, Category, MainCategory, Order, OrderItem, Shop, Review, Customer, Akchii, final_price_expression
 from .forms import CustomerForm
+
+# Публичные страницы не читают сессию и одинаковы для всех посетителей,
+# поэтому их может держать общий кэш или reverse proxy. Персональное
+# (счётчик корзины, CSRF-токен) приходит из cart_summary
+PUBLIC_PAGE_MAX_AGE = 60
+public_page = cache_control(public=True, max_age=PUBLIC_PAGE_MAX_AGE)
 # views.py - добавим в начало
 def get_product_by_id(product_id, model_type='product'):
     """
@@ -26,55 +43,73 @@ def get_cart_products(cart):
     """
     Универсальная функция для получения товаров из корзины
     Возвращает список товаров и общую сумму
+
+    Ключи корзины группируются по типу модели, и каждый тип достаётся одним
+    запросом. Итоговая цена — ProductMixin.final_price: Decimal из поля модели
+    сохраняет два знака после запятой (480.00), в отличие от аннотации Case в SQLite.
     """
+    models_by_type = {'product': Product, 'akchii': Akchii}
+    lines = []
+    ids_by_type = {model_type: [] for model_type in models_by_type}
+    missing = []
+
+    for key, quantity in cart.items():
+        # Определяем тип модели и ID
+        if '_' in key:
+            model_type, _, product_id = key.partition('_')
+        else:
+            model_type, product_id = 'product', key
+        if model_type not in models_by_type or not product_id.isdigit():
+            missing.append(key)
+            continue
+        lines.append((key, model_type, int(product_id), quantity))
+        ids_by_type[model_type].append(int(product_id))
+
+    # Один запрос на тип модели вместо запроса на каждую строку корзины
+    found = {
+        model_type: models_by_type[model_type].objects.filter(available=True).in_bulk(ids)
+        for model_type, ids in ids_by_type.items() if ids
+    }
+
     products = []
     total_price = 0
     total_original_price = 0
     total_savings = 0
 
-    for key, quantity in cart.items():
-        try:
-            # Определяем тип модели и ID
-            if '_' in key:
-                model_type, product_id = key.split('_')
-            else:
-                model_type, product_id = 'product', key
-
-            # Получаем объект товара
-            if model_type == 'akchii':
-                product = Akchii.objects.get(id=int(product_id), available=True)
-            else:
-                product = Product.objects.get(id=int(product_id), available=True)
-
-            # Цены
-            unit_price = product.final_price
-            original_unit_price = product.price
-
-            item_total = unit_price * quantity
-            original_item_total = original_unit_price * quantity
-            item_savings = original_item_total - item_total
-
-            # Добавляем данные в список
-            products.append({
-                'product': product,
-                'model_type': model_type,
-                'quantity': quantity,
-                'unit_price': unit_price,
-                'original_unit_price': original_unit_price,
-                'item_total': item_total,
-                'original_item_total': original_item_total,
-                'item_savings': item_savings,
-            })
+    for key, model_type, product_id, quantity in lines:
+        product = found.get(model_type, {}).get(product_id)
+        if product is None:
+            missing.append(key)
+            continue
 
-            # Считаем общие итоги
-            total_price += item_total
-            total_original_price += original_item_total
-            total_savings += item_savings
+        # Цены
+        unit_price = product.final_price
+        original_unit_price = product.price
 
-        except (Product.DoesNotExist, Akchii.DoesNotExist, ValueError) as e:
-            # Логируем и пропускаем невалидный элемент
-            print(f"Внимание: элемент корзины {key} не найден: {e}")
-            continue
+        item_total = unit_price * quantity
+        original_item_total = original_unit_price * quantity
+        item_savings = original_item_total - item_total
+
+        # Добавляем данные в список
+        products.append({
+            'product': product,
+            'model_type': model_type,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'original_unit_price': original_unit_price,
+            'item_total': item_total,
+            'original_item_total': original_item_total,
+            'item_savings': item_savings,
+        })
+
+        # Считаем общие итоги
+        total_price += item_total
+        total_original_price += original_item_total
+        total_savings += item_savings
+
+    if missing:
+        # Логируем все невалидные элементы разом и пропускаем их
+        print(f"Внимание: элементы корзины не найдены или недоступны: {', '.join(missing)}")
 
     return products, total_price, total_original_price, total_savings
 
@@ -89,13 +124,9 @@ class CustomerListView(ListView):
     def get_queryset(self):
         queryset = super().get_queryset()
         search_query = self.request.GET.get('search', '')
-        if search_query:
-            queryset = queryset.filter(
-                Q(full_name__icontains=search_query) |
-                Q(phone__icontains=search_query) |
-                Q(spouse_name__icontains=search_query) |
-                Q(spouse_phone__icontains=search_query)
-            )
+        if search_query.strip():
+            # Телефон — по нормализованным цифрам, имя — по триграммам (core.crm_search)
+            queryset = queryset.filter(customer_search_filter(search_query))
         return queryset
 
 
@@ -121,6 +152,8 @@ class CustomerUpdateView(UpdateView):
     success_url = reverse_lazy('customer-list')
 
 
+@public_page
+@conditional_page(index_validators)
 def index(request):
     context = {
         'featured_products': Product.objects.filter(featured=True)[:8],
@@ -131,6 +164,7 @@ def index(request):
     return render(request, 'index.html', context)
 
 
+@public_page
 def about(request):
     context = {
         'shops': Shop.objects.all(), 
@@ -138,38 +172,45 @@ def about(request):
     return render(request, 'about.html', context)
 
 
+@public_page
 def delivery(request):
     return render(request, 'delivery.html', {'shops': Shop.objects.all()})
 
 
+@public_page
 def contacts(request):
     return render(request, 'contacts.html', {'shops': Shop.objects.all()})
 
 
-def get_min_max_prices(products):
-    """Get min and max prices for products"""
-    prices = products.aggregate(
-        min_price=Min('price'),
-        max_price=Max('price')
+def price_filter_values(request):
+    """(min_price, max_price) из GET как int; нечисловые значения не применяются — None"""
+    return tuple(
+        int(value) if value and value.isdigit() else None
+        for value in (request.GET.get('min_price'), request.GET.get('max_price'))
     )
-    return {
-        'min': int(prices['min_price']) if prices['min_price'] else 0,
-        'max': int(prices['max_price']) if prices['max_price'] else 10000
-    }
 
 
 def apply_price_filter(queryset, request):
     """Apply price filtering to queryset"""
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    
-    if min_price and min_price.isdigit():
-        queryset = queryset.filter(price__gte=int(min_price))
-    if max_price and max_price.isdigit():
-        queryset = queryset.filter(price__lte=int(max_price))
+    min_price, max_price = price_filter_values(request)
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
     return queryset
 
 from django.db import models
+
+# Сортировки каталога с keyset-пагинацией; последнее поле — уникальный id
+CATALOG_SORTS = {
+    'new': ('-created', '-id'),
+    'price': ('sort_price', 'id'),
+    '-price': ('-sort_price', '-id'),
+}
+
+
+@public_page
+@conditional_page(catalog_validators)
 def catalog_view(request, main_category_slug=None, category_slug=None):
     """Unified catalog view for all categories"""
     # Get base products and categories
@@ -189,18 +230,25 @@ def catalog_view(request, main_category_slug=None, category_slug=None):
     
     # Apply filters and pagination
     filtered_products = apply_price_filter(base_products, request)
-    min_price_range = get_min_max_prices(base_products)
-    # Добавляем аннотацию для сортировки по скидкам
-    from django.db.models import Case, When, Value, IntegerField
-    filtered_products = filtered_products.annotate(
-        has_discount_order=Case(
-            When(skidka__isnull=False, skidka__lt=models.F('price'), then=Value(1)),
-            default=Value(0),
-            output_field=IntegerField()
+    min_price_range = get_price_bounds(main_category, category)
+    sort = request.GET.get('sort', '')
+    if sort in CATALOG_SORTS:
+        # Явная сортировка — keyset-пагинация по курсору вместо OFFSET
+        filtered_products = filtered_products.annotate(sort_price=final_price_expression())
+        paginator = KeysetPaginator(filtered_products, 12, ordering=CATALOG_SORTS[sort])
+        page_obj = paginator.get_page(request.GET.get('cursor'), with_estimate=True)
+    else:
+        # Перемешанный порядок (со скидочными товарами в начале) считается один раз
+        # на категорию и ценовой фильтр и режется на страницы из кэша. В ключе —
+        # фильтр, который реально применён: мусор в GET не плодит записи кэша
+        page_obj = paginate_shuffled(
+            filtered_products,
+            request.GET.get('page'),
+            12,
+            main_category.id if main_category else None,
+            category.id if category else None,
+            *price_filter_values(request),
         )
-    ).order_by('?')
-    paginator = Paginator(filtered_products, 12)
-    page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
         'main_categories': MainCategory.objects.all(),
@@ -209,10 +257,14 @@ def catalog_view(request, main_category_slug=None, category_slug=None):
         'categories': Category.objects.filter(main_category=main_category) if main_category else Category.objects.all(),
         'products': page_obj,
         'min_price_range': min_price_range,
+        'sort': sort,
+        'keyset': sort in CATALOG_SORTS,
     }
     return render(request, 'shop/catalog.html', context)
 
 
+@public_page
+@conditional_page(product_validators)
 def product_detail(request, id, slug):
     product = get_object_or_404(Product, id=id, slug=slug, available=True)
     context = {
@@ -223,6 +275,28 @@ def product_detail(request, id, slug):
     return render(request, 'shop/product_detail.html', context)
 
 
+@public_page
+def search_view(request):
+    """Поиск по товарам и акциям: название, описание, состав букета, ингредиенты"""
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'results': search_products(query) if query else [],
+    }
+    return render(request, 'shop/search.html', context)
+
+
+@public_page
+def search_suggest(request):
+    """Подсказки для строки поиска в шапке (JSON, не больше SUGGEST_MAX_LIMIT)"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = int(request.GET.get('limit', SUGGEST_LIMIT))
+    except ValueError:
+        limit = SUGGEST_LIMIT
+    return JsonResponse({'query': query, 'results': suggest(query, max(limit, 1))})
+
+
 # views.py - заменим cart_operations и cart_operations2
 def cart_operations(request, product_id, operation):
     """Универсальная функция для операций с корзиной (работает с Product и Akchii)"""
@@ -304,6 +378,19 @@ def cart_operations(request, product_id, operation):
 #     request.session.modified = True
 #     messages.success(request, msg)
 #     return redirect('cart_detail')
+@never_cache
+def cart_summary(request):
+    """
+    Персональная часть кэшируемых страниц: количество товаров в корзине
+    и CSRF-токен для форм «в корзину». Запрашивается из base.html.
+    """
+    cart = request.session.get('cart', {})
+    return JsonResponse({
+        'cart_items_count': sum(cart.values()),
+        'csrf_token': get_token(request),
+    })
+
+
 # views.py - заменим cart_detail и cart_detail2
 def cart_detail(request):
     """Универсальная функция для отображения корзины"""
@@ -393,61 +480,19 @@ def checkout(request):
             messages.error(request, "Пожалуйста, заполните обязательные поля")
             return redirect('checkout')
         
-        # Создаем заказ
-        order = Order.objects.create(
-            full_name=request.POST.get('name'),
-            phone=request.POST.get('phone'),
-            address=request.POST.get('address', ''),
-            delivery_type=request.POST.get('delivery_type', 'pickup'),
-            comment=request.POST.get('comment', ''),
-            payment_method=request.POST.get('payment_method', 'cash'),
-            check_file=request.FILES.get('receipt')
-        )
-        
-        # Создаем элементы заказа
-        for item in cart_items:
-            product = item['product']
-            quantity = item['quantity']
-            final_price = item['unit_price']
-            model_type = item['model_type']
-            
-            OrderItem.objects.create(
-                order=order,
-                product=product if model_type == 'product' else None,
-                akchii=product if model_type == 'akchii' else None,
-                quantity=quantity,
-                price=final_price
-            )
-        
-        # Подготавливаем детали заказа для Telegram
-        order_details = {
-            'id': order.id,
-            'name': order.full_name,
-            'phone': order.phone,
-            'address': order.address,
-            'delivery_type': order.delivery_type,
-            'payment_method': order.get_payment_method_display(),
-            'comment': order.comment,
-            'has_receipt': bool(order.check_file),
-            'items': [{
-                'name': f"{item['product'].name} {'(АКЦИЯ)' if item['model_type'] == 'akchii' else ''}",
-                'quantity': item['quantity'],
-                'price': item['unit_price'],
-                'total': item['item_total']
-            } for item in cart_items],
-            'total_price': total_price,
-        }
+        # Создаем заказ, его элементы и уведомление одной транзакцией
+        order, order_details = place_order({
+            'full_name': request.POST.get('name'),
+            'phone': request.POST.get('phone'),
+            'address': request.POST.get('address', ''),
+            'delivery_type': request.POST.get('delivery_type', 'pickup'),
+            'comment': request.POST.get('comment', ''),
+            'payment_method': request.POST.get('payment_method', 'cash'),
+            'check_file': request.FILES.get('receipt'),
+        }, cart_items, total_price)
         
-        # Отправляем уведомление в Telegram
-        document_path = None
-        if order.check_file:
-            document_path = order.check_file.path
-        
-        message = format_telegram_message(order_details)
-        if send_telegram_notification(message, document_path):
-            messages.success(request, "Заказ успешно оформлен! Уведомление отправлено менеджерам.")
-        else:
-            messages.success(request, "Заказ оформлен! Не удалось отправить уведомление менеджерам.")
+        # Уведомление менеджерам уже в очереди и уйдёт в фоне
+        messages.success(request, "Заказ успешно оформлен! Менеджеры скоро получат уведомление.")
         
         # Очищаем корзину
         request.session['cart'] = {}
@@ -605,40 +650,7 @@ def crm_view(request, template):
 
 
 
-def format_telegram_message(order_details):
-    """Format order details for Telegram notification with HTML formatting"""
-    
-    items_text = "\n".join(
-        f"• {item['name']} - {item['quantity']} × {item['price']} сом = {item['total']} сом"
-        for item in order_details['items']
-    )
-    
-    delivery_info = "🚚 Доставка" if order_details['delivery_type'] == 'delivery' else "🏪 Самовывоз"
-    if order_details.get('address'):
-        delivery_info += f"\n📍 Адрес: {order_details['address']}"
-    
-    payment_method = order_details.get('payment_method', 'не указан')
-    receipt_info = "\n🧾 Чек об оплате приложен" if order_details.get('has_receipt') else "\n⏳ Чек не предоставлен"
-    
-    return f"""
-<b>🛒 НОВЫЙ ЗАКАЗ #{order_details.get('id', '')}</b>
-
-👤 <b>Клиент:</b> {order_details['name']}
-📞 <b>Телефон:</b> {order_details['phone']}
-💳 <b>Способ оплаты:</b> {payment_method}{receipt_info}
-
-{delivery_info}
-
-<b>Состав заказа:</b>
-{items_text}
-
-<b>💰 Итого к оплате:</b> <u>{order_details['total_price']} сом</u>
-
-💬 <b>Комментарий:</b> {order_details['comment'] or 'нет'}
-"""
-
-
-
+@public_page
 def main_menu(request):
     # Получаем основные категории для отображения
     main_categories = MainCategory.objects.all()
@@ -659,6 +671,8 @@ from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q, Avg, Max
 from .models import Akchii
+@public_page
+@conditional_page(discounts_validators)
 def discounts_view(request):
     """
     Представление для страницы акционных товаров
@@ -669,45 +683,29 @@ def discounts_view(request):
         available=True
     ).order_by('-created')
     
-    # Вычисляем статистику для акций
-    discount_products_count = discount_products.count()
-    
-    if discount_products_count > 0:
-        # Максимальный процент скидки
-        products_with_discount = [
-            product for product in discount_products 
-            if product.has_discount
-        ]
-        
-        if products_with_discount:
-            max_discount_percentage = max(
-                product.discount_percentage 
-                for product in products_with_discount
-            )
-            
-            # Средний процент скидки
-            total_discount = sum(
-                product.discount_percentage 
-                for product in products_with_discount
-            )
-            average_discount_percentage = total_discount // len(products_with_discount)
-        else:
-            max_discount_percentage = 0
-            average_discount_percentage = 0
+    # Статистика акций одним агрегатом в БД; процент — как в ProductMixin.discount_percentage
+    discounted = Q(skidka__lt=F('price'))
+    percentage = Floor(ExpressionWrapper(
+        (F('price') - F('skidka')) * 100 / F('price'),
+        output_field=DecimalField(max_digits=12, decimal_places=4),
+    ))
+    stats = discount_products.order_by().aggregate(
+        total=Count('id'),
+        discounted=Count('id', filter=discounted),
+        max_percentage=Max(percentage, filter=discounted),
+        percentage_sum=Sum(percentage, filter=discounted),
+    )
+    discount_products_count = stats['total']
+    if stats['discounted']:
+        max_discount_percentage = int(stats['max_percentage'])
+        average_discount_percentage = int(stats['percentage_sum']) // stats['discounted']
     else:
         max_discount_percentage = 0
         average_discount_percentage = 0
-    
-    # Пагинация
-    page = request.GET.get('page', 1)
-    paginator = Paginator(discount_products, 12)
-    
-    try:
-        discount_products_paginated = paginator.page(page)
-    except PageNotAnInteger:
-        discount_products_paginated = paginator.page(1)
-    except EmptyPage:
-        discount_products_paginated = paginator.page(paginator.num_pages)
+
+    # Пагинация по курсору: лента отсортирована по (-created, -id)
+    paginator = KeysetPaginator(discount_products, 12, ordering=('-created', '-id'))
+    discount_products_paginated = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'discount_products': discount_products_paginated,
@@ -718,6 +716,8 @@ def discounts_view(request):
     
     return render(request, 'shop/akchii.html', context)
 
+@public_page
+@conditional_page(discounts_validators)
 def discount_product_detail(request, id, slug):
     """
     Детальная страница акционного товара
@@ -16,6 +16,8 @@ import os
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 TELEGRAM_BOT_TOKEN = '8071433935:AAH7UySRWRyaijG_bvXBb6sgi-Psrix_i1A'
+# Адрес Bot API; для проверки очереди уведомлений можно указать локальный фейковый сервер
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -44,6 +46,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Сжатие — последним на пути ответа, минификация — перед ним
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.HtmlMinifyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -123,8 +128,70 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = '/static/'
-# STATICFILES_DIRS = [BASE_DIR / 'static']
-STATIC_ROOT = BASE_DIR / 'static'
+# Исходники статики; collectstatic собирает их в STATIC_ROOT с хэшами в именах.
+# staticfiles/ не в git: при развёртывании после migrate и createcachetable
+# выполнить collectstatic, иначе страницы падают на {% static %} без записи в манифесте
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.static_assets.OptimizedManifestStaticFilesStorage',
+    },
+}
+
+# Сжатие картинок статики с потерями при collectstatic: PNG в палитру 256 цветов,
+# JPEG пересохраняется. Без этой настройки PNG только пересжимаются без потерь.
+# Включено: в static/images логотипы, иконки и QR-коды с плоскими цветами, и
+# бюджет .png ниже рассчитан на палитру (logo2.png без неё ~264 КБ, с ней ~24 КБ)
+STATIC_LOSSY_IMAGES = True
+
+# Бюджет размера собранной статики в байтах: путь или расширение.
+# Для текстовых файлов считается сжатый размер. Проверка: python manage.py static_report
+STATIC_SIZE_BUDGET = {
+    '.png': 120 * 1024,
+    '.jpg': 150 * 1024,
+    '.webp': 120 * 1024,
+    '.css': 40 * 1024,
+    '.js': 60 * 1024,
+}
+
+# Сообщения core (сжатие статики при collectstatic и т. п.) — в консоль
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Общий для всех воркеров кэш: на нём держатся сброс границ цен и перестановки
+# каталога. У LocMemCache (Django по умолчанию) кэш свой в каждом процессе,
+# и сброс в одном воркере не доходит до остальных.
+# По умолчанию — таблица в БД, с REDIS_URL — Redis. Таблицу создаёт
+# manage.py createcachetable: при развёртывании запускать после migrate
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'core_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
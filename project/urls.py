@@ -15,10 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings 
 from django.conf.urls.static import static 
 from core import views
+from core.static_assets import serve_static
 
 
 urlpatterns = [  
@@ -38,8 +39,11 @@ urlpatterns = [
     path('catalog/<slug:main_category_slug>/', views.catalog_view, name='catalog_by_main_category'),
     path('catalog/<slug:main_category_slug>/<slug:category_slug>/', views.catalog_view, name='catalog_by_category'),
     path('product/<int:id>/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('search/', views.search_view, name='search'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
     
     path('cart/', views.cart_detail, name='cart_detail'),
+    path('cart/summary/', views.cart_summary, name='cart_summary'),
    
     
     path('checkout/', views.checkout, name='checkout'),
@@ -77,4 +81,9 @@ path('cart/update/<int:product_id>/', views.cart_operations, {'operation': 'upda
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+
+# Собранная статика (collectstatic): immutable-кэш для файлов с хэшем и сжатые копии.
+# При runserver с DEBUG статику раньше отдаёт staticfiles прямо из static/
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static),
+]
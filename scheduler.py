@@ -8,9 +8,12 @@ django.setup()
 
 
 from core.utils import send_daily_report
+from core.outbox import drain_outbox
 
 scheduler = BlockingScheduler()
 scheduler.add_job(send_daily_report, 'cron', hour=11, minute=50)
+# Повторные попытки отправки уведомлений о заказах
+scheduler.add_job(drain_outbox, 'interval', seconds=30)
 
 if __name__ == "__main__":
     print("✅ Планировщик запущен...")